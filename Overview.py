@@ -1,6 +1,7 @@
 import streamlit as st
 import streamlit.components.v1 as components
 import os
+from tool import start_cache_warmer
 
 
 try:
@@ -20,6 +21,9 @@ st.set_page_config(
     initial_sidebar_state="expanded"
 )
 
+# Preload popular searches so the Tool page starts warm
+start_cache_warmer()
+
 # Page title
 st.markdown('<h1 class="title-text">Smart Meal Analyzer</h1>', unsafe_allow_html=True)
 
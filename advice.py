@@ -0,0 +1,135 @@
+import os
+import time
+from collections import deque
+
+import streamlit as st
+from dotenv import load_dotenv
+from openai import OpenAI
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+
+load_dotenv()
+
+# --- Model routing ---
+# Meals with few items and a short prompt go to the fast model
+ADVICE_MODEL = os.getenv("OPENAI_ADVICE_MODEL", "gpt-4")
+FAST_ADVICE_MODEL = os.getenv("OPENAI_FAST_ADVICE_MODEL", "gpt-4o-mini")
+SIMPLE_MEAL_MAX_ITEMS = int(os.getenv("ADVICE_SIMPLE_MEAL_MAX_ITEMS", "3"))
+SIMPLE_MEAL_MAX_PROMPT_TOKENS = int(os.getenv("ADVICE_SIMPLE_MEAL_MAX_PROMPT_TOKENS", "600"))
+
+# Most recent calls, newest last
+ADVICE_METRICS = deque(maxlen=200)
+
+# Static guidelines, identical on every call
+SYSTEM_PROMPT = """You are a nutrition assistant helping users improve a meal based on its actual foods.
+Give 1-3 (prefer 1-2) very specific bullet points that make the meal healthier, even if it is already good.
+- Rarely suggest replacing an item; at most suggest a smaller amount unless a swap clearly helps.
+- Prefer healthier cooking or preparation over substitutes. Ignore sodium.
+- Stay context-aware: for an all-candy meal, suggest portion control or swapping some candy for nuts, dark chocolate or Greek yogurt, not chicken or vegetables.
+- Be realistic, friendly, short and actionable; avoid generic advice like "add more protein".
+- Do not restate nutrient amounts.
+- Start with: "Here are some ideas to improve your meal:\""""
+
+USER_PROMPT = """Totals: {calories} kcal, protein {protein} g, carbs {carbs} g, fat {fat} g, sugar {sugar} g
+Foods: {foods}
+Lower sugar/fat swaps (use only if worthwhile): {swaps}"""
+
+
+@st.cache_resource
+def get_openai_client() -> OpenAI:
+    return OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+
+
+@st.cache_resource
+def _get_encoding(model: str):
+    if tiktoken is None:
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except Exception:
+        try:
+            return tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            # Encodings are downloaded on first use and may be unavailable
+            return None
+
+
+def count_tokens(messages: list, model: str) -> int:
+    encoding = _get_encoding(model)
+    total = 0
+    for message in messages:
+        if encoding is None:
+            total += len(message["content"]) // 4
+        else:
+            total += len(encoding.encode(message["content"]))
+        # Per-message framing overhead of the chat format
+        total += 4
+    return total + 3
+
+
+def choose_model(meal_items: list, prompt_tokens: int) -> str:
+    # Swap candidates exist for most foods, so they only count through the prompt size
+    if len(meal_items) <= SIMPLE_MEAL_MAX_ITEMS and prompt_tokens <= SIMPLE_MEAL_MAX_PROMPT_TOKENS:
+        return FAST_ADVICE_MODEL
+    return ADVICE_MODEL
+
+
+def build_messages(nutrients: dict, meal_items: list, swaps: dict = None) -> list:
+    swap_text = "; ".join(
+        f"{name} -> {', '.join(swap['description'] for swap in options)}"
+        for name, options in (swaps or {}).items()
+    ) or "none"
+
+    user_prompt = USER_PROMPT.format(
+        calories=nutrients["calories"],
+        protein=nutrients["protein"],
+        carbs=nutrients["carbs"],
+        fat=nutrients["fat"],
+        sugar=nutrients["sugar"],
+        foods=", ".join(f"{item['name']} ({item['grams']}g)" for item in meal_items),
+        swaps=swap_text,
+    )
+    return [
+        {"role": "system", "content": SYSTEM_PROMPT},
+        {"role": "user", "content": user_prompt},
+    ]
+
+
+def get_gpt_meal_advice(nutrients: dict, meal_items: list, swaps: dict = None) -> tuple:
+    """Ask the routed model for meal advice.
+
+    Returns the advice text and the metrics recorded for the call.
+    """
+    messages = build_messages(nutrients, meal_items, swaps)
+    prompt_tokens = count_tokens(messages, FAST_ADVICE_MODEL)
+    model = choose_model(meal_items, prompt_tokens)
+
+    metrics = {
+        "model": model,
+        "items": len(meal_items),
+        "estimated_prompt_tokens": prompt_tokens,
+    }
+
+    start = time.perf_counter()
+    response = get_openai_client().chat.completions.create(
+        model=model,
+        messages=messages,
+        temperature=0.7,
+        max_tokens=300,
+    )
+    metrics["latency_s"] = round(time.perf_counter() - start, 3)
+
+    usage = response.usage
+    if usage is not None:
+        metrics["prompt_tokens"] = usage.prompt_tokens
+        metrics["completion_tokens"] = usage.completion_tokens
+        metrics["total_tokens"] = usage.total_tokens
+
+    ADVICE_METRICS.append(metrics)
+    print("Meal advice call:", metrics)
+
+    return response.choices[0].message.content.strip(), metrics
@@ -0,0 +1,124 @@
+import re
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from tool import load_food_data
+
+
+# First category with a keyword in the leading part of the description wins
+CATEGORY_KEYWORDS = {
+    "Baby Foods": ["babyfood", "infant formula", "toddler"],
+    "Fast Food & Restaurant": ["fast foods", "fast food", "restaurant", "school lunch"],
+    "Beverages": ["beverages", "alcoholic beverage", "coffee", "tea", "juice", "soda", "water", "drink"],
+    "Snacks & Sweets": [
+        "snacks", "candies", "cookies", "crackers", "cake", "pie", "desserts", "ice cream",
+        "frozen novelties", "puddings", "chocolate", "doughnuts", "pastry", "brownies", "frostings",
+        "sweeteners", "sugars", "syrups", "jams", "gelatin",
+    ],
+    "Soups & Sauces": ["soup", "sauce", "gravy", "salad dressing", "dressing", "condiment", "ketchup", "mustard", "vinegar"],
+    "Fats & Oils": ["oil", "margarine", "shortening", "butter", "lard", "fat"],
+    "Dairy & Eggs": ["cheese", "milk", "yogurt", "cream", "egg", "whey"],
+    "Fish & Seafood": ["fish", "crustaceans", "mollusks", "salmon", "tuna", "shrimp", "crab", "cod"],
+    "Meat & Poultry": [
+        "beef", "pork", "lamb", "veal", "chicken", "turkey", "game meat", "bacon", "sausage",
+        "ham", "duck", "goose", "frankfurter", "bologna", "luncheon", "salami",
+    ],
+    "Legumes, Nuts & Seeds": [
+        "beans", "nuts", "seeds", "peanut", "lentils", "peas", "chickpeas", "soy", "soybeans", "cowpeas",
+        "tofu", "hummus",
+    ],
+    "Grains & Bakery": [
+        "cereals", "bread", "rice", "pasta", "noodles", "flour", "rolls", "muffins", "tortillas",
+        "bagels", "biscuits", "pancakes", "waffles", "oats", "wheat", "corn", "barley", "quinoa",
+    ],
+    "Fruits": [
+        "apples", "bananas", "oranges", "grapes", "berries", "strawberries", "blueberries", "peaches",
+        "pears", "plums", "cherries", "melons", "pineapple", "mangos", "apricots", "figs", "raisins",
+        "lemons", "limes", "grapefruit", "kiwifruit", "papayas", "fruit", "avocados",
+    ],
+    "Vegetables": [
+        "potatoes", "tomatoes", "carrots", "onions", "lettuce", "spinach", "broccoli", "cabbage",
+        "peppers", "squash", "cucumber", "celery", "mushrooms", "kale", "beets", "cauliflower",
+        "sweet potato", "asparagus", "vegetables", "greens",
+    ],
+}
+
+# Label shown in the browse view -> column of the catalogue frame
+SORT_COLUMNS = {
+    "Calories (kcal/100g)": "Calories",
+    "Protein (g/100g)": "Protein",
+    "Carbs (g/100g)": "Carbohydrate",
+    "Fat (g/100g)": "Fats",
+    "Sugar (g/100g)": "Sugars",
+    "Protein per 100 kcal": "protein_per_100kcal",
+    "Sugar share of carbs": "sugar_share_of_carbs",
+    "Fat share of calories": "fat_share_of_calories",
+}
+
+ALL_CATEGORIES = "All"
+
+
+CATEGORY_PATTERNS = {
+    category: re.compile(r"\b(?:" + "|".join(map(re.escape, keywords)) + r")(?:s|es)?\b")
+    for category, keywords in CATEGORY_KEYWORDS.items()
+}
+
+
+def categorize(description: str) -> str:
+    head = description.split(",")[0].lower()
+    for category, pattern in CATEGORY_PATTERNS.items():
+        if pattern.search(head):
+            return category
+    return "Other"
+
+
+class Catalogue:
+    """Local food table with sort permutations precomputed per category.
+
+    Every (category, column, direction) has its row order built at load
+    time, so fetching a page is a slice of an index array rather than a
+    sort of the table.
+    """
+
+    def __init__(self, food_df: pd.DataFrame):
+        foods = food_df.reset_index(drop=True).copy()
+        if "category" not in foods:
+            foods["category"] = foods["description"].map(categorize)
+
+        calories = foods["Calories"].where(foods["Calories"] > 0)
+        carbs = foods["Carbohydrate"].where(foods["Carbohydrate"] > 0)
+        foods["protein_per_100kcal"] = (foods["Protein"] / calories * 100).round(2)
+        foods["sugar_share_of_carbs"] = (foods["Sugars"] / carbs).clip(upper=1).round(3)
+        foods["fat_share_of_calories"] = (foods["Fats"] * 9 / calories).clip(upper=1).round(3)
+        self.foods = foods
+
+        self.categories = [ALL_CATEGORIES] + sorted(foods["category"].unique())
+        category_values = foods["category"].to_numpy()
+        category_masks = {ALL_CATEGORIES: np.ones(len(foods), dtype=bool)}
+        for category in self.categories[1:]:
+            category_masks[category] = category_values == category
+
+        self.orders = {}
+        for column in SORT_COLUMNS.values():
+            values = foods[column].to_numpy(dtype=float)
+            # Missing values sort last in both directions
+            ascending = np.argsort(values, kind="stable")
+            descending = np.argsort(-values, kind="stable")
+            for category, mask in category_masks.items():
+                self.orders[(category, column, False)] = ascending[mask[ascending]]
+                self.orders[(category, column, True)] = descending[mask[descending]]
+
+    def count(self, category: str) -> int:
+        return len(self.orders[(category, "Calories", False)])
+
+    def page(self, category: str, column: str, descending: bool, page: int, page_size: int) -> pd.DataFrame:
+        order = self.orders[(category, column, descending)]
+        rows = order[page * page_size:(page + 1) * page_size]
+        return self.foods.iloc[rows]
+
+
+@st.cache_resource(show_spinner="📚 Preparing catalogue...")
+def load_catalogue() -> Catalogue:
+    return Catalogue(load_food_data())
@@ -0,0 +1,111 @@
+"""Offline enrichment of the local food table.
+
+Imputes missing macros in one vectorized pass and records where every
+value came from, so request-time code only reads finished values:
+
+    python enrichment.py [--input cleaned_food_sample.csv] [--output enriched_food_sample.csv]
+"""
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from catalog import categorize
+from tool import ENRICHED_FOOD_PATH, FOOD_NUTRIENT_COLUMNS, RAW_FOOD_PATH, convert_kj_rows, normalize_food_table
+
+
+# Provenance values of the <column>_source columns
+REPORTED = "reported"
+ENERGY_DIFFERENCE = "energy_difference"
+CATEGORY_MEDIAN = "category_median"
+OVERALL_MEDIAN = "overall_median"
+ATWATER = "atwater"
+
+
+def _fill_from_medians(foods: pd.DataFrame, column: str, sources: dict):
+    """Fill gaps in `column` with its per-category median, then the overall median."""
+    values = foods[column]
+    category_median = values.groupby(foods["category"]).transform("median")
+
+    missing = foods[column].isna()
+    use_category = missing & category_median.notna()
+    foods.loc[use_category, column] = category_median[use_category]
+    sources[column][use_category] = CATEGORY_MEDIAN
+
+    missing = foods[column].isna()
+    foods.loc[missing, column] = values.median()
+    sources[column][missing] = OVERALL_MEDIAN
+
+
+def enrich_food_table(food_df: pd.DataFrame) -> pd.DataFrame:
+    foods = normalize_food_table(food_df)
+    foods["category"] = foods["description"].map(categorize)
+    sources = {
+        column: pd.Series(np.where(foods[column].isna(), "", REPORTED), index=foods.index, dtype=object)
+        for column in FOOD_NUTRIENT_COLUMNS
+    }
+
+    # Upstream sugar estimates are a flat share of carbs; re-impute them
+    # like missing values so they follow the food's category instead
+    if "sugar_was_estimated" in foods:
+        estimated = foods["sugar_was_estimated"].astype(str).str.upper() == "TRUE"
+        foods.loc[estimated, "Sugars"] = np.nan
+
+    # Carbs by difference when energy, protein and fat are known. Results
+    # that break the 100 g mass balance (e.g. energy still in kJ) are dropped.
+    carbs_by_difference = ((foods["Calories"] - 4 * foods["Protein"] - 9 * foods["Fats"]) / 4).round(2)
+    carbs_missing = (
+        foods["Carbohydrate"].isna()
+        & (carbs_by_difference >= 0)
+        & (carbs_by_difference <= 100 - foods["Protein"] - foods["Fats"])
+    )
+    foods.loc[carbs_missing, "Carbohydrate"] = carbs_by_difference[carbs_missing]
+    sources["Carbohydrate"][carbs_missing] = ENERGY_DIFFERENCE
+
+    for column in ["Protein", "Fats", "Carbohydrate"]:
+        _fill_from_medians(foods, column, sources)
+
+    # Sugar as the category's typical share of carbs, never above the carbs
+    sugar_share = (foods["Sugars"] / foods["Carbohydrate"].where(foods["Carbohydrate"] > 0)).clip(upper=1)
+    category_share = sugar_share.groupby(foods["category"]).transform("median")
+    sugar_missing = foods["Sugars"].isna()
+    use_category = sugar_missing & category_share.notna()
+    share = category_share.where(use_category, sugar_share.median())
+    foods.loc[sugar_missing, "Sugars"] = (share * foods["Carbohydrate"])[sugar_missing].round(2)
+    sources["Sugars"][use_category] = CATEGORY_MEDIAN
+    sources["Sugars"][sugar_missing & ~use_category] = OVERALL_MEDIAN
+
+    # Rows whose macros were missing could not be checked for kJ energy at ingest
+    macros_imputed = (
+        (sources["Protein"] != REPORTED) | (sources["Fats"] != REPORTED) | (sources["Carbohydrate"] != REPORTED)
+    )
+    convert_kj_rows(foods, rows=macros_imputed)
+
+    calories_missing = foods["Calories"].isna()
+    foods.loc[calories_missing, "Calories"] = (
+        4 * (foods["Carbohydrate"] + foods["Protein"]) + 9 * foods["Fats"]
+    )[calories_missing].round(1)
+    sources["Calories"][calories_missing] = ATWATER
+
+    for column in FOOD_NUTRIENT_COLUMNS:
+        foods[f"{column}_source"] = sources[column]
+    return foods
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Impute missing nutrients in the local food table.")
+    parser.add_argument("--input", default=RAW_FOOD_PATH)
+    parser.add_argument("--output", default=ENRICHED_FOOD_PATH)
+    args = parser.parse_args()
+
+    foods = enrich_food_table(pd.read_csv(args.input))
+    foods.to_csv(args.output, index=False)
+
+    print(f"Wrote {len(foods)} foods to {args.output}")
+    for column in FOOD_NUTRIENT_COLUMNS:
+        counts = foods[f"{column}_source"].value_counts()
+        print(f"  {column}: " + ", ".join(f"{source}={count}" for source, count in counts.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError, ThreadPoolExecutor
+
+import streamlit as st
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "8"))
+
+
+@st.cache_resource
+def get_job_executor() -> ThreadPoolExecutor:
+    """Thread pool shared by every session for slow I/O (FDC details, advice)."""
+    return ThreadPoolExecutor(max_workers=JOB_WORKERS, thread_name_prefix="meal-jobs")
+
+
+def _jobs() -> dict:
+    if "jobs" not in st.session_state:
+        st.session_state.jobs = {}
+    return st.session_state.jobs
+
+
+def submit_job(name: str, label: str, fn, *args, scope: str = None):
+    """Run `fn(*args)` in the background and track it under `name`.
+
+    Jobs with a `scope` are cancelled by cancel_stale_jobs once the scope
+    (e.g. the meal they were started for) changes. The function must not
+    touch st.session_state; results are collected on the script thread.
+    """
+    cancel_job(name)
+    future = get_job_executor().submit(fn, *args)
+    _jobs()[name] = {
+        "future": future,
+        "label": label,
+        "scope": scope,
+        "started": time.monotonic(),
+    }
+    return future
+
+
+def _gather(futures: list) -> Future:
+    """Future that completes with every result, in order, once all are done."""
+    batch = Future()
+    remaining = [len(futures)]
+    lock = threading.Lock()
+
+    def on_done(_):
+        with lock:
+            remaining[0] -= 1
+            if remaining[0]:
+                return
+        try:
+            results = [future.result() for future in futures]
+        except BaseException as e:  # includes CancelledError
+            results, error = None, e
+        else:
+            error = None
+        try:
+            if error is None:
+                batch.set_result(results)
+            else:
+                batch.set_exception(error)
+        except InvalidStateError:
+            # The batch itself was cancelled
+            pass
+
+    def on_cancel(future):
+        if future.cancelled():
+            for child in futures:
+                child.cancel()
+
+    batch.add_done_callback(on_cancel)
+    if not futures:
+        batch.set_result([])
+    for future in futures:
+        future.add_done_callback(on_done)
+    return batch
+
+
+def submit_batch_job(name: str, label: str, fn, items: list, scope: str = None):
+    """Run `fn(item)` for every item concurrently, tracked as one job.
+
+    The job's result is the list of results in the order of `items`.
+    """
+    cancel_job(name)
+    executor = get_job_executor()
+    future = _gather([executor.submit(fn, item) for item in items])
+    _jobs()[name] = {
+        "future": future,
+        "label": label,
+        "scope": scope,
+        "started": time.monotonic(),
+    }
+    return future
+
+
+def cancel_job(name: str):
+    job = _jobs().pop(name, None)
+    if job:
+        # A job that is already running finishes, but its result is dropped
+        job["future"].cancel()
+
+
+def cancel_stale_jobs(scope: str):
+    for name, job in list(_jobs().items()):
+        if job["scope"] is not None and job["scope"] != scope:
+            cancel_job(name)
+
+
+def pending_jobs() -> dict:
+    return {name: job for name, job in _jobs().items() if not job["future"].done()}
+
+
+def pop_finished_jobs() -> dict:
+    """Remove finished jobs and return them by name."""
+    finished = {name: job for name, job in _jobs().items() if job["future"].done()}
+    for name in finished:
+        del _jobs()[name]
+    return finished
@@ -0,0 +1,169 @@
+import json
+import os
+import sqlite3
+import uuid
+from datetime import date, datetime, timedelta
+
+import streamlit as st
+
+
+DB_PATH = os.getenv("MEAL_LOG_PATH", "meal_log.sqlite3")
+
+NUTRIENT_FIELDS = ["calories", "protein", "carbs", "fat", "sugar"]
+
+_ROLLUP_COLUMNS = ", ".join(f"{field} REAL NOT NULL DEFAULT 0" for field in NUTRIENT_FIELDS)
+
+SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS meals (
+    id INTEGER PRIMARY KEY,
+    client_id TEXT NOT NULL,
+    logged_at TEXT NOT NULL,
+    day TEXT NOT NULL,
+    items TEXT NOT NULL,
+    {_ROLLUP_COLUMNS}
+);
+CREATE TABLE IF NOT EXISTS daily_rollups (
+    client_id TEXT NOT NULL,
+    day TEXT NOT NULL,
+    meals INTEGER NOT NULL DEFAULT 0,
+    {_ROLLUP_COLUMNS},
+    PRIMARY KEY (client_id, day)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weekly_rollups (
+    client_id TEXT NOT NULL,
+    week TEXT NOT NULL,
+    meals INTEGER NOT NULL DEFAULT 0,
+    {_ROLLUP_COLUMNS},
+    PRIMARY KEY (client_id, week)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS foods (
+    fdc_id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL,
+    per_100g TEXT NOT NULL
+);
+"""
+
+
+def connect(path: str = DB_PATH) -> sqlite3.Connection:
+    conn = sqlite3.connect(path, timeout=10)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+    return conn
+
+
+def get_client_id() -> str:
+    """Anonymous id kept in the page URL so a bookmarked link keeps its history."""
+    client_id = st.query_params.get("cid")
+    if not client_id:
+        client_id = uuid.uuid4().hex
+        st.query_params["cid"] = client_id
+    return client_id
+
+
+def iso_week(day: date) -> str:
+    year, week, _ = day.isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def _upsert_rollup(conn, table: str, key_column: str, client_id: str, key: str, totals: dict):
+    columns = ", ".join(NUTRIENT_FIELDS)
+    placeholders = ", ".join("?" for _ in NUTRIENT_FIELDS)
+    increments = ", ".join(f"{field} = {field} + excluded.{field}" for field in NUTRIENT_FIELDS)
+    conn.execute(
+        f"INSERT INTO {table} (client_id, {key_column}, meals, {columns}) "
+        f"VALUES (?, ?, 1, {placeholders}) "
+        f"ON CONFLICT (client_id, {key_column}) DO UPDATE SET meals = meals + 1, {increments}",
+        [client_id, key] + [totals[field] for field in NUTRIENT_FIELDS],
+    )
+
+
+def log_meal(client_id: str, meal_items: list, logged_at: datetime = None, path: str = DB_PATH) -> int:
+    """Append a meal and fold its totals into the daily and weekly rollups."""
+    logged_at = logged_at or datetime.now()
+    totals = {
+        field: round(sum(float(item.get(field, 0)) for item in meal_items), 2)
+        for field in NUTRIENT_FIELDS
+    }
+
+    conn = connect(path)
+    try:
+        with conn:
+            cursor = conn.execute(
+                f"INSERT INTO meals (client_id, logged_at, day, items, {', '.join(NUTRIENT_FIELDS)}) "
+                f"VALUES (?, ?, ?, ?, {', '.join('?' for _ in NUTRIENT_FIELDS)})",
+                [
+                    client_id,
+                    logged_at.isoformat(timespec="seconds"),
+                    logged_at.date().isoformat(),
+                    json.dumps(meal_items),
+                ] + [totals[field] for field in NUTRIENT_FIELDS],
+            )
+            _upsert_rollup(conn, "daily_rollups", "day", client_id, logged_at.date().isoformat(), totals)
+            _upsert_rollup(conn, "weekly_rollups", "week", client_id, iso_week(logged_at.date()), totals)
+        return cursor.lastrowid
+    finally:
+        conn.close()
+
+
+def daily_history(client_id: str, days: int = 7, path: str = DB_PATH) -> list:
+    since = (date.today() - timedelta(days=days - 1)).isoformat()
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT * FROM daily_rollups WHERE client_id = ? AND day >= ? ORDER BY day",
+            (client_id, since),
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def weekly_history(client_id: str, weeks: int = 4, path: str = DB_PATH) -> list:
+    since = iso_week(date.today() - timedelta(weeks=weeks - 1))
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            "SELECT * FROM weekly_rollups WHERE client_id = ? AND week >= ? ORDER BY week",
+            (client_id, since),
+        ).fetchall()
+        return [dict(row) for row in rows]
+    finally:
+        conn.close()
+
+
+def remember_foods(meal_items: list, path: str = DB_PATH):
+    """Keep the per-100g values of added foods so shared meals rehydrate locally."""
+    rows = [
+        (int(item["fdc_id"]), item["name"], json.dumps(item["per_100g"]))
+        for item in meal_items
+        if item.get("fdc_id") is not None and item.get("per_100g")
+    ]
+    if not rows:
+        return
+    conn = connect(path)
+    try:
+        with conn:
+            conn.executemany(
+                "INSERT OR REPLACE INTO foods (fdc_id, name, per_100g) VALUES (?, ?, ?)", rows
+            )
+    finally:
+        conn.close()
+
+
+def recall_foods(fdc_ids: list, path: str = DB_PATH) -> dict:
+    if not fdc_ids:
+        return {}
+    conn = connect(path)
+    try:
+        rows = conn.execute(
+            f"SELECT fdc_id, name, per_100g FROM foods WHERE fdc_id IN ({', '.join('?' for _ in fdc_ids)})",
+            [int(fdc_id) for fdc_id in fdc_ids],
+        ).fetchall()
+        return {
+            row["fdc_id"]: {"name": row["name"], "per_100g": json.loads(row["per_100g"])}
+            for row in rows
+        }
+    finally:
+        conn.close()
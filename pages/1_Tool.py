@@ -1,3 +1,4 @@
+import copy
 import pandas as pd
 from streamlit_searchbox import st_searchbox
 import re
@@ -6,7 +7,15 @@ import streamlit.components.v1 as components
 import os
 from dotenv import load_dotenv
 from tool import search_usda_foods  
-from tool import get_usda_food_details, extract_nutrient_summary
+from tool import scale_nutrients, start_cache_warmer, fetch_meal_item, meal_signature, estimated_nutrients
+from substitutions import load_substitution_index
+from search import federated_search
+from advice import get_gpt_meal_advice
+from meal_log import get_client_id, log_meal, daily_history, weekly_history, remember_foods
+from share import encode_meal, decode_meal, rehydrate_meal, shareable_items, MAX_ITEMS
+from jobs import submit_job, submit_batch_job, cancel_stale_jobs, pending_jobs, pop_finished_jobs
+from recipe import parse_recipe, resolve_ingredient
+from profiling import profile_rerun, profiled
 from rapidfuzz import process
 from tool import search_usda_foods 
 from thefuzz import process  
@@ -25,6 +34,9 @@ st.set_page_config(
 )
 
 
+# Preload popular searches and foods once per process
+start_cache_warmer()
+
 left_col, right_col = st.columns([2, 1])
 
 import requests
@@ -34,7 +46,8 @@ import requests
 #def load_food_data():
     #return pd.read_csv("cleaned_food_sample.csv")
 
-with left_col:
+# Sampled profiling of the whole run (SMART_MEAL_PROFILE_RATE or ?profile=1)
+with profile_rerun("app"), left_col:
     #food_df = load_food_data()
     #all_foods = food_df["description"].dropna().unique().tolist()
 
@@ -42,6 +55,20 @@ with left_col:
     if "meal_list" not in st.session_state:
         st.session_state.meal_list = []
 
+    # --- Shared Meal Link (rebuilt from local data, no FDC calls) ---
+    shared_code = st.query_params.get("m")
+    if shared_code:
+        if not st.session_state.meal_list:
+            try:
+                shared_items, unknown_ids = rehydrate_meal(decode_meal(shared_code))
+                st.session_state.meal_list = shared_items
+                if unknown_ids:
+                    st.warning(f"⚠️ {len(unknown_ids)} shared food(s) could not be loaded.")
+            except ValueError:
+                st.warning("⚠️ This meal link is invalid.")
+        # The meal now lives in the session; the page URL only keeps this visitor's own id
+        del st.query_params["m"]
+
     # --- App UI ---
     st.markdown('<h1 class="title-text">Build Your Meal</h1>', unsafe_allow_html=True)
     st.write("Start typing a food and customize portion size to get full nutrition info.")
@@ -61,59 +88,19 @@ with left_col:
         from tool import search_usda_foods  # You already have this
 
 
-    def match_score(description, query):
-        desc = description.lower()
-        query = query.lower()
-        query_words = query.split()
-    
-        # Require all words in query to be present in description
-        if all(word in desc for word in query_words):
-            if desc == query:
-                return 0
-            if desc.startswith(query):
-                return 1
-            if query in desc:
-                return 2
-            return 3
-        return 99  # Penalize if any word is missing
-    
-    def boost_priority(description):
-        desc = description.lower()
-        penalty = 0
-        if "babyfood" in desc:
-            penalty += 2
-        if "dry mix" in desc:
-            penalty += 2
-        if "raw" in desc:
-            penalty -= 1
-        return penalty
-    
     def smart_ranked_usda_results(search_term: str) -> list:
-        results = search_usda_foods(search_term, "SR Legacy", 100)
-        if not results:
+        top_results = federated_search(search_term)
+        if not top_results:
             return []
     
-        def description_length_penalty(desc):
-            return len(desc.split())
-    
-        def combined_score(item):
-            desc = item["description"]
-            return (
-                match_score(desc, search_term)
-                + boost_priority(desc)
-                + 0.05 * description_length_penalty(desc)
-            )
-    
-        # Sort by score and return top N
-        sorted_results = sorted(results, key=combined_score)
-        top_results = sorted_results[:20]
-    
         # Store mapping from cleaned label to fdcId
         search_lookup = {}
         cleaned_labels = []
         for item in top_results:
             # Remove anything in parentheses from the label
             label = re.sub(r"\s*\(.*?\)", "", item["description"]).strip()
+            if label in search_lookup:
+                continue
             search_lookup[label] = item["fdcId"]
             cleaned_labels.append(label)
     
@@ -121,154 +108,278 @@ with left_col:
     
         return cleaned_labels
     
-    selected = st_searchbox(
-        smart_ranked_usda_results,
-        placeholder="Start typing a food...",
-        key="food_search"
-    )
-    
-    # Save selection to session state
-    if selected:
-        food_name = selected  # it's just a string label
-        fdc_id = st.session_state.get("search_lookup", {}).get(selected)
-    
-        if fdc_id:
-            st.session_state["selected_food_name"] = food_name
-            st.session_state["selected_fdc_id"] = fdc_id
-        else:
-            st.warning("⚠️ FDC ID not found.")
-    
-    # --- Grams input ---
-    grams = st.number_input(
-        "How many grams are you eating?",
-        min_value=1,
-        value=100,
-        step=1,
-        help="If you're not sure, use the reference table to the right."
-    )
-    
-    # --- Add Selected Food to Meal ---
-    if selected and st.button("Add to Meal"):
-        fdc_id = st.session_state.get("selected_fdc_id")
-        food_name = st.session_state.get("selected_food_name")
-    
-        if fdc_id:
-            food_data = get_usda_food_details(fdc_id)
-            if food_data:
-                summary = extract_nutrient_summary(food_data)
-    
-                # Identify missing nutrients
-                missing_fields = []
-                for field in ["Calories", "Protein", "Carbs", "Fat", "Sugar"]:
-                    if field not in summary:
-                        missing_fields.append(field)
-    
-                if missing_fields:
-                    st.markdown(
-                        f"""
-                        <div style="background-color:#ffb3b3; color:#000000; padding:10px; border-left:6px solid #ff5959; border-radius:4px;">
-                            <strong>Nutrient(s) not reported by source:</strong> {', '.join(missing_fields)}.<br>
-                            Values shown as 0g but may be present.
-                        </div>
-                        """,
-                        unsafe_allow_html=True
-                    )
-    
-                multiplier = grams / 100
-    
-                def safe_get(nutrient_name):
-                    try:
-                        raw = summary[nutrient_name]  # e.g., "371 KJ" or "89 KCAL"
-                        val, unit = raw.split()
-                        val = float(val)
-    
-                        if nutrient_name == "Calories":
-                            if unit.upper() == "KJ":
-                                val = val / 4.184
-                            elif unit.upper() == "KCAL":
-                                pass
-                            else:
-                                st.warning(f"Unexpected energy unit: {unit}")
-    
-                        return round(val * multiplier, 1)
-    
-                    except Exception as e:
-                        return 0
-    
-                st.session_state.meal_list.append({
-                    "name": f"{food_name} ({grams}g)",
-                    "calories": safe_get("Calories"),
-                    "protein": safe_get("Protein"),
-                    "carbs": safe_get("Carbs"),
-                    "fat": safe_get("Fat"),
-                    "sugar": safe_get("Sugar")
-                })
+    # --- Search / Add Panel (reruns on its own) ---
+    @st.fragment
+    @profiled("search_panel")
+    def search_panel():
+        selected = st_searchbox(
+            smart_ranked_usda_results,
+            placeholder="Start typing a food...",
+            key="food_search",
+            rerun_scope="fragment"
+        )
+
+        # Save selection to session state
+        if selected:
+            food_name = selected  # it's just a string label
+            fdc_id = st.session_state.get("search_lookup", {}).get(selected)
+
+            if fdc_id:
+                st.session_state["selected_food_name"] = food_name
+                st.session_state["selected_fdc_id"] = fdc_id
             else:
-                st.error("❌ Could not fetch food details.")
-        else:
-            st.warning("⚠️ FDC ID not found.")
+                st.warning("⚠️ FDC ID not found.")
+
+        # --- Grams input ---
+        grams = st.number_input(
+            "How many grams are you eating?",
+            min_value=1,
+            value=100,
+            step=1,
+            help="If you're not sure, use the reference table to the right."
+        )
 
-    # --- Display Meal Table ---
-    item_deleted = False
-    
-    if st.session_state.meal_list:
-        st.subheader("Your Meal")
-    
-        # Show each item
-        for i in range(len(st.session_state.meal_list)):
-            if i >= len(st.session_state.meal_list):
-                break
-    
-            item = st.session_state.meal_list[i]
-    
-            col1, col2 = st.columns([8, 1])
-            with col1:
-                st.markdown(
-                    f"**{item['name']}**  \n"
-                    f"Calories: {item['calories']:.1f} kcal, "
-                    f"Protein: {item['protein']:.1f}g, "
-                    f"Carbs: {item['carbs']:.1f}g, "
-                    f"Fat: {item['fat']:.1f}g, "
-                    f"Sugar: {item['sugar']:.1f}g"
+        # Shown once after the full rerun that follows an add
+        missing_fields = st.session_state.pop("missing_nutrients_notice", None)
+        if missing_fields:
+            st.markdown(
+                f"""
+                <div style="background-color:#ffb3b3; color:#000000; padding:10px; border-left:6px solid #ff5959; border-radius:4px;">
+                    <strong>Nutrient(s) not reported by source:</strong> {', '.join(missing_fields)}.<br>
+                    Values shown as 0g but may be present.
+                </div>
+                """,
+                unsafe_allow_html=True
+            )
+
+        filled_fields = st.session_state.pop("filled_nutrients_notice", None)
+        if filled_fields:
+            estimated_fields = estimated_nutrients(filled_fields)
+            reported_fields = [label for label in filled_fields if label not in estimated_fields]
+            notice = f"Nutrient(s) not reported by source: {', '.join(filled_fields)}."
+            if reported_fields:
+                notice += f" Filled in from the local food table: {', '.join(reported_fields)}."
+            if estimated_fields:
+                notice += f" Estimated from similar foods: {', '.join(estimated_fields)}."
+            st.info(notice)
+
+        # --- Add Selected Food to Meal ---
+        if selected and st.button("Add to Meal", key="add_to_meal"):
+            fdc_id = st.session_state.get("selected_fdc_id")
+            food_name = st.session_state.get("selected_food_name")
+
+            if fdc_id:
+                # Details are fetched in the background; the job panel adds the item
+                submit_job(
+                    f"add:{fdc_id}:{grams}",
+                    f"Getting details for {food_name}...",
+                    fetch_meal_item, fdc_id, food_name, grams
                 )
-            with col2:
-                if st.button("❌", key=f"remove_{i}"):
-                    st.session_state.meal_list.pop(i)
-                    item_deleted = True
-                    break  # break to rerun layout
-    
-    # --- Meal Totals and Warnings ---
-    if st.session_state.meal_list:
+                # The job panel and meal panel live outside this fragment
+                st.rerun()
+            else:
+                st.warning("⚠️ FDC ID not found.")
+
+    search_panel()
+
+    # --- Paste a Recipe (reruns on its own) ---
+    @st.fragment
+    @profiled("recipe_panel")
+    def recipe_panel():
+        with st.expander("Paste a recipe"):
+            recipe_text = st.text_area(
+                "One ingredient per line or comma-separated",
+                placeholder="2 cups cooked rice, 150 g chicken breast",
+                key="recipe_text"
+            )
+            if st.button("Add all to Meal", disabled=not recipe_text.strip(), key="add_recipe"):
+                ingredients = parse_recipe(recipe_text)
+                if ingredients:
+                    submit_batch_job(
+                        "recipe",
+                        f"Matching {len(ingredients)} ingredients...",
+                        resolve_ingredient, ingredients
+                    )
+                    st.rerun()
+                else:
+                    st.warning("⚠️ No ingredients found.")
+
+    recipe_panel()
+
+    # --- Background Job Status (polls only while jobs are running) ---
+    @profiled("job_panel")
+    def apply_finished_jobs(finished: dict) -> bool:
+        """Collect the results of finished jobs; returns whether anything changed."""
+        meal_changed = False
+        for name, job in finished.items():
+            future = job["future"]
+            if future.cancelled():
+                continue
+            if future.exception() is not None:
+                st.session_state["job_error"] = f"❌ {job['label'].rstrip('.')} failed: {future.exception()}"
+                meal_changed = True
+            elif name.startswith("add:"):
+                item, missing_fields, filled_fields = future.result()
+                if item is None:
+                    st.session_state["job_error"] = "❌ Could not fetch food details."
+                else:
+                    if missing_fields:
+                        st.session_state["missing_nutrients_notice"] = missing_fields
+                    if filled_fields:
+                        st.session_state["filled_nutrients_notice"] = filled_fields
+                    st.session_state.meal_list.append(item)
+                    remember_foods([item])
+                meal_changed = True
+            elif name == "recipe":
+                resolved = future.result()
+                recipe_items = [ingredient["item"] for ingredient in resolved if ingredient["item"]]
+                st.session_state.meal_list.extend(recipe_items)
+                remember_foods(recipe_items)
+                st.session_state["recipe_notice"] = resolved
+                meal_changed = True
+            elif name == "advice":
+                advice, advice_metrics = future.result()
+                st.session_state.meal_advice = {
+                    "scope": job["scope"],
+                    "text": advice,
+                    "metrics": advice_metrics,
+                }
+                meal_changed = True
+        return meal_changed
+
+    @st.fragment(run_every=0.5)
+    def job_panel():
+        finished = pop_finished_jobs()
+        # Only polls that apply a finished job are profiled, not every tick
+        meal_changed = apply_finished_jobs(finished) if finished else False
+
+        # A full rerun also stops the polling once the meal panel has
+        # cancelled the last job
+        if meal_changed or not st.session_state.get("jobs"):
+            st.rerun()
+
+        for job in pending_jobs().values():
+            st.caption(f"⏳ {job['label']}")
+
+    if st.session_state.get("jobs"):
+        job_panel()
+
+    job_error = st.session_state.pop("job_error", None)
+    if job_error:
+        st.error(job_error)
+
+    recipe_notice = st.session_state.pop("recipe_notice", None)
+    if recipe_notice:
+        unresolved = [f"{i['line']} ({i['error']})" for i in recipe_notice if not i["item"]]
+        estimated = [i["line"] for i in recipe_notice if i["item"] and i["estimated"]]
+        if unresolved:
+            st.warning("⚠️ Could not add: " + "; ".join(unresolved))
+        if estimated:
+            st.info("Amounts estimated from typical serving sizes: " + "; ".join(estimated))
+
+    # --- Nutritional Warnings ---
+    def generate_meal_warnings(nutrients: dict) -> list:
+        limits = {
+            'calories': 750,
+            'sugar': 20,
+            'fat': 30,
+            'carbs': 100,
+            'protein': 15
+        }
+        warnings = []
+
+        if nutrients['calories'] > limits['calories']:
+            warnings.append(f"This meal is high in calories ({nutrients['calories']} kcal). Consider a lighter option.")
+        if nutrients['sugar'] > limits['sugar']:
+            warnings.append(f"High in sugar ({nutrients['sugar']}g).")
+        if nutrients['fat'] > limits['fat']:
+            warnings.append(f"High fat content ({nutrients['fat']}g).")
+        if nutrients['carbs'] > limits['carbs']:
+            warnings.append(f"High in carbs ({nutrients['carbs']}g).")
+        if nutrients['protein'] < limits['protein']:
+            warnings.append(f"Low protein ({nutrients['protein']}g).")
+
+        return warnings
+
+    # --- Meal Table Edits ---
+    if "meal_version" not in st.session_state:
+        st.session_state.meal_version = 0
+
+    def apply_meal_edits(editor_key):
+        edited_rows = st.session_state[editor_key]["edited_rows"]
+        removed = set()
+        for row, changes in edited_rows.items():
+            item = st.session_state.meal_list[int(row)]
+            if changes.get("remove"):
+                removed.add(int(row))
+            elif changes.get("grams"):
+                item["grams"] = changes["grams"]
+                item.update(scale_nutrients(item["per_100g"], item["grams"]))
+
+        st.session_state.meal_list = [
+            item for i, item in enumerate(st.session_state.meal_list) if i not in removed
+        ]
+        # New editor key so the widget starts from the updated list
+        st.session_state.meal_version += 1
+
+    # --- Meal Panel (reruns on its own) ---
+    @st.fragment
+    @profiled("meal_panel")
+    def meal_panel(client_id):
+        # Drop advice that was started for a different version of the meal
+        current_meal = meal_signature(st.session_state.meal_list)
+        cancel_stale_jobs(current_meal)
+
+        if not st.session_state.meal_list:
+            st.info("Your meal is currently empty.")
+            return
+
+        st.subheader("Your Meal")
+
+        # Built separately from the page URL, which carries the meal log id
+        share_url = f"{st.context.url or ''}?m={encode_meal(st.session_state.meal_list)}"
+        with st.expander("Share this meal"):
+            st.code(share_url, language=None)
+            if len(shareable_items(st.session_state.meal_list)) < len(st.session_state.meal_list):
+                st.caption(f"Links hold up to {MAX_ITEMS} foods; the rest of this meal is left out.")
+
         meal_df = pd.DataFrame(st.session_state.meal_list)
+        meal_df["remove"] = False
+        editor_key = f"meal_editor_{st.session_state.meal_version}"
+        st.data_editor(
+            meal_df[["name", "grams", "calories", "protein", "carbs", "fat", "sugar", "remove"]],
+            key=editor_key,
+            on_change=apply_meal_edits,
+            args=(editor_key,),
+            hide_index=True,
+            use_container_width=True,
+            disabled=["name", "calories", "protein", "carbs", "fat", "sugar"],
+            column_config={
+                "name": "Food",
+                "grams": st.column_config.NumberColumn("Grams", min_value=1, step=1),
+                "calories": st.column_config.NumberColumn("Calories", format="%.1f kcal"),
+                "protein": st.column_config.NumberColumn("Protein", format="%.1f g"),
+                "carbs": st.column_config.NumberColumn("Carbs", format="%.1f g"),
+                "fat": st.column_config.NumberColumn("Fat", format="%.1f g"),
+                "sugar": st.column_config.NumberColumn("Sugar", format="%.1f g"),
+                "remove": st.column_config.CheckboxColumn("❌"),
+            },
+        )
+
+        estimated_items = [
+            f"{item['name']} ({', '.join(item['estimated_nutrients'])})"
+            for item in st.session_state.meal_list
+            if item.get("estimated_nutrients")
+        ]
+        if estimated_items:
+            st.caption("Estimated from similar foods: " + "; ".join(estimated_items))
+
+        # --- Meal Totals and Warnings ---
         total = meal_df[["calories", "protein", "carbs", "fat", "sugar"]].sum().round(2)
-    
+
         st.markdown("### Meal Totals")
         st.table(total.to_frame().T.reset_index(drop=True))
-    
-        # --- Nutritional Warnings ---
-        def generate_meal_warnings(nutrients: dict) -> list:
-            limits = {
-                'calories': 750,
-                'sugar': 20,
-                'fat': 30,
-                'carbs': 100,
-                'protein': 15
-            }
-            warnings = []
-    
-            if nutrients['calories'] > limits['calories']:
-                warnings.append(f"This meal is high in calories ({nutrients['calories']} kcal). Consider a lighter option.")
-            if nutrients['sugar'] > limits['sugar']:
-                warnings.append(f"High in sugar ({nutrients['sugar']}g).")
-            if nutrients['fat'] > limits['fat']:
-                warnings.append(f"High fat content ({nutrients['fat']}g).")
-            if nutrients['carbs'] > limits['carbs']:
-                warnings.append(f"High in carbs ({nutrients['carbs']}g).")
-            if nutrients['protein'] < limits['protein']:
-                warnings.append(f"Low protein ({nutrients['protein']}g).")
-    
-            return warnings
-    
+
         nutrients = {
             "calories": total.get("calories", 0),
             "sugar": total.get("sugar", 0),
@@ -279,7 +390,7 @@ with left_col:
             "sodium": 0,
             "fiber": 0
         }
-    
+
         warnings = generate_meal_warnings(nutrients)
         if warnings:
             st.markdown("### ⚠️ Nutritional Warnings")
@@ -287,94 +398,72 @@ with left_col:
                 st.warning(w)
         else:
             st.success("✅ This meal meets general nutrition guidelines.")
-    
-    else:
-        st.info("Your meal is currently empty.")
-        # define `total` as blank dict to avoid error in future access
-        total = {"calories": 0, "protein": 0, "carbs": 0, "fat": 0, "sugar": 0}
-    
-    # Re-run if deleted
-    if item_deleted:
-        st.rerun()
-    
-    # Generate advice button
-    if st.button("This is my complete meal"):
-        st.session_state.generate_advice = True
-    
-
-
-    import openai  # or wherever you're calling GPT
-    from dotenv import load_dotenv
-    import os
-    from openai import OpenAI
-    
-    load_dotenv()
-
-    # Get key securely
-    openai.api_key = os.getenv("OPENAI_API_KEY")
-
-    client = OpenAI(api_key=openai.api_key)
-
-    def get_gpt_meal_advice(nutrients: dict, meal_items: list) -> str:
-        prompt = f"""
-        You are a highly specialized nutrition assistant helping users improve their meals based on actual content and context.
-
-        TASK:
-        Given the meal's total nutrients and food items, give 1–3 very specific, relevant suggestions to improve the healthiness of the meal — even if it’s already good. However, lean towards 1-2 bullet points.
-
-        GUIDELINES:
-        - Very rarley reccomend replacing an item entirely. At most, reccomend downsizing the amount but unless it ruins the meal, don't give unecessary substitutes. 
-        - Rather than giving substitutes, advise on ways to make the cooking or preparation healthier. Do not worry about sodium intake.
-        - Suggestions must be context-aware and food-aware. For example, if the meal is entirely candy, do NOT suggest chicken or vegetables — instead suggest portion control or swapping some candy for nuts, dark chocolate, or Greek yogurt.
-        - Be realistic and approachable — don’t be overly strict.
-        - Start with: "Here are some ideas to improve your meal:"
-        - Do NOT mention nutrients again (like "high sugar").
-        - Avoid generic advice like “add more protein” — be food-specific.
-        - Keep tone friendly, short, and actionable.
-
-        NUTRIENT TOTALS:
-        Calories: {nutrients['calories']} kcal
-        Protein: {nutrients['protein']} g
-        Carbs: {nutrients['carbs']} g
-        Fat: {nutrients['fat']} g
-        Sugar: {nutrients['sugar']} g
-
-        FOOD ITEMS:
-        {', '.join(item['name'] for item in meal_items)}
-        """
-
-        response = client.chat.completions.create(
-        model="gpt-4",
-        messages=[{"role": "user", "content": prompt}],
-        temperature=0.7,
-        max_tokens=300,
-        )
-
-        return response.choices[0].message.content.strip()
 
-    # --- Display GPT Advice if user clicked "complete meal" ---
-    if st.session_state.get("generate_advice") and st.session_state.meal_list:
-        st.markdown("### Advice for Improving Your Meal")
-
-        # Rebuild nutrient totals in case meal changed
-        meal_df = pd.DataFrame(st.session_state.meal_list)
-        total = meal_df[["calories", "protein", "carbs", "fat", "sugar"]].sum().round(2)
-
-        nutrients = {
-        "calories": total.get("calories", 0),
-        "sugar": total.get("sugar", 0),
-        "fat": total.get("fat", 0),
-        "carbs": total.get("carbs", 0),
-        "protein": total.get("protein", 0)
-        }
-
-        with st.spinner("Thinking..."):
-            advice = get_gpt_meal_advice(nutrients, st.session_state.meal_list)
-
-        st.success(advice)
+        # --- Healthier Swaps from the local food table ---
+        meal_swaps = {}
+        substitution_index = load_substitution_index()
+        for item in st.session_state.meal_list:
+            if item.get("fdc_id") is None:
+                continue
+            swaps = substitution_index.healthier_alternatives(item["fdc_id"], limit=3)
+            if swaps:
+                meal_swaps[item["name"]] = swaps
+
+        if meal_swaps:
+            with st.expander("Similar foods with less sugar or fat"):
+                for name, swaps in meal_swaps.items():
+                    st.markdown(f"**{name}**")
+                    for swap in swaps:
+                        st.markdown(
+                            f"- {swap['description']} "
+                            f"({swap['Calories']:.0f} kcal, "
+                            f"Sugar: {swap['Sugars']:.1f}g, "
+                            f"Fat: {swap['Fats']:.1f}g per 100g)"
+                        )
+
+        # Generate advice button
+        if st.button("This is my complete meal", key="complete_meal"):
+            submit_job(
+                "advice",
+                "Thinking about your meal...",
+                get_gpt_meal_advice,
+                nutrients, copy.deepcopy(st.session_state.meal_list), meal_swaps,
+                scope=current_meal
+            )
+            # Start the job panel so it can pick up the advice
+            st.rerun()
+
+        # --- Save Meal to Persistent Log ---
+        if st.button("Save to my meal log", key="save_meal"):
+            log_meal(client_id, st.session_state.meal_list)
+            st.toast("✅ Meal saved to your log.")
+
+        # --- Display GPT Advice for the meal as it is now ---
+        meal_advice = st.session_state.get("meal_advice")
+        if meal_advice and meal_advice["scope"] == current_meal:
+            st.markdown("### Advice for Improving Your Meal")
+            advice_metrics = meal_advice["metrics"]
+
+            st.success(meal_advice["text"])
+            st.caption(
+                f"{advice_metrics['model']} · {advice_metrics['latency_s']:.1f}s · "
+                f"{advice_metrics.get('total_tokens', advice_metrics['estimated_prompt_tokens'])} tokens"
+            )
 
-        # Optional: reset the flag so it doesn’t repeat every rerun
-        st.session_state.generate_advice = False
+    client_id = get_client_id()
+    meal_panel(client_id)
+
+    # --- Meal History (read from incremental rollups) ---
+    with st.expander("Your meal history"):
+        daily = daily_history(client_id)
+        if daily:
+            st.markdown("**Last 7 days**")
+            st.dataframe(pd.DataFrame(daily).drop(columns="client_id"), hide_index=True)
+            st.markdown("**Last 4 weeks**")
+            st.dataframe(pd.DataFrame(weekly_history(client_id)).drop(columns="client_id"), hide_index=True)
+            st.caption("Bookmark this page's link to keep your history.")
+        else:
+            st.write("No meals logged yet.")
 
 with right_col:
 
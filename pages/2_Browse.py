@@ -0,0 +1,76 @@
+import streamlit as st
+from catalog import load_catalogue, SORT_COLUMNS
+from tool import FOOD_TABLE_FIELDS, local_estimated_nutrients, make_meal_item
+
+
+# --- Page Config ---
+st.set_page_config(
+    page_title="Smart Meal Helper",
+    page_icon="🥗",
+    layout="wide",
+    initial_sidebar_state="expanded"
+)
+
+PAGE_SIZE = 25
+
+if "meal_list" not in st.session_state:
+    st.session_state.meal_list = []
+
+st.markdown('<h1 class="title-text">Browse Foods</h1>', unsafe_allow_html=True)
+st.write("Filter by category and sort by any nutrient, e.g. highest protein per calorie or lowest sugar snacks.")
+
+catalogue = load_catalogue()
+
+# --- Filters ---
+filter_col, sort_col, order_col = st.columns([2, 2, 1])
+with filter_col:
+    category = st.selectbox("Category", catalogue.categories, key="browse_category")
+with sort_col:
+    sort_label = st.selectbox("Sort by", list(SORT_COLUMNS), key="browse_sort")
+with order_col:
+    descending = st.radio("Order", ["Highest first", "Lowest first"], key="browse_order") == "Highest first"
+
+total_foods = catalogue.count(category)
+page_count = max(1, -(-total_foods // PAGE_SIZE))
+page_number = st.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, value=1, step=1)
+
+# --- Current Page (a slice of the precomputed order) ---
+page_df = catalogue.page(category, SORT_COLUMNS[sort_label], descending, page_number - 1, PAGE_SIZE)
+display_columns = ["description", "category", "Calories", "Protein", "Carbohydrate", "Fats", "Sugars"]
+if SORT_COLUMNS[sort_label] not in display_columns:
+    display_columns.append(SORT_COLUMNS[sort_label])
+
+selection = st.dataframe(
+    page_df[display_columns],
+    hide_index=True,
+    on_select="rerun",
+    selection_mode="multi-row",
+    key="browse_table",
+    column_config={
+        "description": "Food",
+        "category": "Category",
+        "Calories": st.column_config.NumberColumn("Calories", format="%.0f kcal"),
+        "Carbohydrate": "Carbs",
+        "Fats": "Fat",
+        "Sugars": "Sugar",
+    },
+)
+st.caption(f"{total_foods} foods · values per 100 g")
+
+# --- Add Selected Foods to Meal ---
+selected_rows = selection.selection.rows
+grams = st.number_input("Grams of each selected food", min_value=1, value=100, step=1)
+if st.button("Add selected to Meal", disabled=not selected_rows):
+    for _, food in page_df.iloc[selected_rows].iterrows():
+        per_100g = {field: float(food[column]) for field, column in FOOD_TABLE_FIELDS.items()}
+        fdc_id = int(food["fdc_id"])
+        st.session_state.meal_list.append(
+            make_meal_item(food["description"], fdc_id, grams, per_100g, local_estimated_nutrients(fdc_id))
+        )
+    st.success(f"✅ Added {len(selected_rows)} food(s) to your meal.")
+
+st.markdown("<hr>", unsafe_allow_html=True)
+st.markdown(
+    "<p style='text-align: center; font-size: 0.8em;'>2025 Smart Meal Helper</p>",
+    unsafe_allow_html=True
+)
@@ -0,0 +1,141 @@
+import os
+import sqlite3
+import threading
+from collections import Counter
+
+
+DB_PATH = os.getenv("POPULARITY_LOG_PATH", "popularity.sqlite3")
+
+# Buffered counts are written out after this many records or seconds
+FLUSH_EVERY_RECORDS = 50
+FLUSH_EVERY_SECONDS = 30
+
+# Longer queries are more likely to identify a person than a food
+MAX_QUERY_LENGTH = 40
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS query_counts (
+    query TEXT NOT NULL,
+    data_type TEXT NOT NULL,
+    page_size INTEGER NOT NULL,
+    hits INTEGER NOT NULL,
+    PRIMARY KEY (query, data_type, page_size)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS food_counts (
+    fdc_id INTEGER PRIMARY KEY,
+    hits INTEGER NOT NULL
+);
+"""
+
+
+def normalize_query(query: str) -> str:
+    return " ".join(query.lower().split())
+
+
+class QueryLog:
+    """Anonymous search and selection frequencies.
+
+    Only normalized query text and FDC ids are counted; nothing about the
+    session is stored. Counts are buffered in memory and merged into SQLite
+    in batches by a background thread, so recording stays off the request
+    path.
+    """
+
+    def __init__(self, path: str = DB_PATH):
+        self.path = path
+        self.lock = threading.Lock()
+        self.queries = Counter()
+        self.foods = Counter()
+        self.pending = 0
+        self.flush_requested = threading.Event()
+        self.flusher = None
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=10)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.executescript(SCHEMA)
+        return conn
+
+    def record_query(self, query: str, data_type: str, page_size: int):
+        query = normalize_query(query)
+        if not query or len(query) > MAX_QUERY_LENGTH:
+            return
+        with self.lock:
+            self.queries[(query, data_type, page_size)] += 1
+            self._record()
+
+    def record_food(self, fdc_id):
+        with self.lock:
+            self.foods[int(fdc_id)] += 1
+            self._record()
+
+    def _record(self):
+        self.pending += 1
+        if self.flusher is None:
+            self.flusher = threading.Thread(target=self._run_flusher, name="popularity-flush", daemon=True)
+            self.flusher.start()
+        if self.pending >= FLUSH_EVERY_RECORDS:
+            self.flush_requested.set()
+
+    def _run_flusher(self):
+        # Writes happen here, so recording only ever touches the counters
+        while True:
+            self.flush_requested.wait(FLUSH_EVERY_SECONDS)
+            self.flush_requested.clear()
+            self.flush()
+
+    def flush(self):
+        with self.lock:
+            queries, foods = self.queries, self.foods
+            self.queries, self.foods = Counter(), Counter()
+            self.pending = 0
+        if not queries and not foods:
+            return
+
+        try:
+            conn = self._connect()
+        except sqlite3.Error as e:
+            print("Failed to open popularity log:", e)
+            return
+        try:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO query_counts (query, data_type, page_size, hits) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT (query, data_type, page_size) DO UPDATE SET hits = hits + excluded.hits",
+                    [(*key, hits) for key, hits in queries.items()],
+                )
+                conn.executemany(
+                    "INSERT INTO food_counts (fdc_id, hits) VALUES (?, ?) "
+                    "ON CONFLICT (fdc_id) DO UPDATE SET hits = hits + excluded.hits",
+                    list(foods.items()),
+                )
+        except sqlite3.Error as e:
+            print("Failed to write popularity log:", e)
+        finally:
+            conn.close()
+
+    def top_queries(self, limit: int) -> list:
+        """Most frequent (query, data_type, page_size) keys, most popular first."""
+        self.flush()
+        conn = self._connect()
+        try:
+            return conn.execute(
+                "SELECT query, data_type, page_size FROM query_counts ORDER BY hits DESC LIMIT ?",
+                (limit,),
+            ).fetchall()
+        finally:
+            conn.close()
+
+    def top_foods(self, limit: int) -> list:
+        self.flush()
+        conn = self._connect()
+        try:
+            rows = conn.execute(
+                "SELECT fdc_id FROM food_counts ORDER BY hits DESC LIMIT ?", (limit,)
+            ).fetchall()
+            return [row[0] for row in rows]
+        finally:
+            conn.close()
+
+
+query_log = QueryLog()
@@ -0,0 +1,138 @@
+import cProfile
+import functools
+import os
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+
+import streamlit as st
+
+try:
+    from pyinstrument import Profiler
+    from pyinstrument.renderers import SpeedscopeRenderer
+except ImportError:
+    Profiler = None
+
+
+# Fraction of reruns to profile; ?profile=1 forces one
+PROFILE_RATE = float(os.getenv("SMART_MEAL_PROFILE_RATE", "0"))
+PROFILE_DIR = os.getenv("SMART_MEAL_PROFILE_DIR", "profiles")
+
+# Oldest profiles are deleted beyond this many files
+PROFILE_MAX_FILES = int(os.getenv("SMART_MEAL_PROFILE_MAX_FILES", "200"))
+
+# pyinstrument sampling interval in seconds
+PROFILE_INTERVAL_S = float(os.getenv("SMART_MEAL_PROFILE_INTERVAL_S", "0.001"))
+
+_SNAPSHOT_KEY = "_profile_widget_snapshot"
+_active = threading.local()
+
+
+def _should_profile() -> bool:
+    if st.query_params.get("profile") == "1":
+        return True
+    return PROFILE_RATE > 0 and random.random() < PROFILE_RATE
+
+
+def triggering_action() -> str:
+    """Names the widgets whose values changed since the previous run.
+
+    Buttons only appear here when they have a key.
+    """
+    snapshot = {}
+    for key in st.session_state:
+        if key == _SNAPSHOT_KEY or str(key).startswith("$$"):
+            continue
+        value = st.session_state[key]
+        if isinstance(value, (str, int, float, bool, type(None))):
+            snapshot[key] = repr(value)
+
+    previous = st.session_state.get(_SNAPSHOT_KEY)
+    st.session_state[_SNAPSHOT_KEY] = snapshot
+    if previous is None:
+        return "initial"
+
+    changed = []
+    for key, value in snapshot.items():
+        if key in previous:
+            if previous[key] != value:
+                changed.append(str(key))
+        elif value == repr(True):
+            # Newly created widgets only count when they fire (a clicked button)
+            changed.append(str(key))
+    return "+".join(sorted(changed)) or "rerun"
+
+
+def _prune_profiles():
+    paths = [os.path.join(PROFILE_DIR, name) for name in os.listdir(PROFILE_DIR)]
+    paths.sort(key=os.path.getmtime)
+    for path in paths[:max(0, len(paths) - PROFILE_MAX_FILES)]:
+        os.remove(path)
+
+
+def _output_path(scope: str, action: str, extension: str) -> str:
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    tag = re.sub(r"[^\w+.-]", "_", f"{scope}-{action}")[:120]
+    return os.path.join(PROFILE_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{tag}.{extension}")
+
+
+@contextmanager
+def profile_rerun(scope: str = "app"):
+    """Profile the wrapped block for a sampled share of reruns.
+
+    Writes a speedscope file when pyinstrument is installed, otherwise a
+    cProfile stats file (viewable with snakeviz or flameprof). Nested
+    blocks inside an outer one are not profiled again.
+    """
+    if getattr(_active, "running", False):
+        yield
+        return
+
+    _active.running = True
+    try:
+        # Snapshot on every run, so the tag names what triggered this one
+        action = triggering_action()
+        if not _should_profile():
+            yield
+            return
+
+        if Profiler is not None:
+            profiler = Profiler(interval=PROFILE_INTERVAL_S)
+            profiler.start()
+        else:
+            profiler = cProfile.Profile()
+            profiler.enable()
+
+        try:
+            # st.rerun() and st.stop() end a run by raising, so write in finally
+            yield
+        finally:
+            try:
+                if Profiler is not None:
+                    profiler.stop()
+                    path = _output_path(scope, action, "speedscope.json")
+                    with open(path, "w") as f:
+                        f.write(profiler.output(SpeedscopeRenderer()))
+                else:
+                    profiler.disable()
+                    path = _output_path(scope, action, "prof")
+                    profiler.dump_stats(path)
+                print("Profile written:", path)
+                _prune_profiles()
+            except Exception as e:
+                print("Failed to write profile:", e)
+    finally:
+        _active.running = False
+
+
+def profiled(scope: str):
+    """Decorator for fragments, whose own reruns skip the page-level profile."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with profile_rerun(scope):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
@@ -0,0 +1,189 @@
+import re
+
+from search import federated_search
+from tool import (
+    estimated_nutrients, extract_nutrient_summary, fill_missing_nutrients, get_usda_food_details, make_meal_item,
+    nutrients_per_100g,
+)
+
+
+# Mass units convert directly
+GRAMS_PER_UNIT = {
+    "g": 1,
+    "kg": 1000,
+    "mg": 0.001,
+    "oz": 28.35,
+    "lb": 453.6,
+}
+
+# Household units, with the words FDC portions use for them
+HOUSEHOLD_UNIT_ALIASES = {
+    "cup": ("cup", "cups", "c"),
+    "tbsp": ("tbsp", "tablespoon", "tablespoons", "tbs", "tbl"),
+    "tsp": ("tsp", "teaspoon", "teaspoons"),
+    "fl oz": ("fl oz", "fluid ounce", "fluid ounces"),
+    "ml": ("ml", "milliliter", "milliliters", "millilitre", "millilitres"),
+    "slice": ("slice", "slices"),
+    "piece": ("piece", "pieces", "pc", "pcs"),
+    "clove": ("clove", "cloves"),
+    "can": ("can", "cans"),
+    "small": ("small",),
+    "medium": ("medium", "med"),
+    "large": ("large", "lg"),
+}
+
+# Used when the food has no matching FDC portion (water-like density)
+FALLBACK_GRAMS_PER_UNIT = {
+    "cup": 240,
+    "tbsp": 15,
+    "tsp": 5,
+    "fl oz": 30,
+    "ml": 1,
+    "slice": 30,
+    "piece": 50,
+    "clove": 3,
+    "can": 355,
+    "small": 100,
+    "medium": 150,
+    "large": 200,
+    "": 100,
+}
+
+# Portions that stand for one whole item, most typical first; used when
+# the line has no unit ("2 bananas")
+COUNT_PORTION_WORDS = ("each", "medium", "whole", "piece", "nlea serving", "serving", "large", "small")
+
+UNIT_WORDS = {
+    alias: unit
+    for unit, aliases in HOUSEHOLD_UNIT_ALIASES.items()
+    for alias in aliases
+}
+UNIT_WORDS.update({
+    "gram": "g", "grams": "g", "kilogram": "kg", "kilograms": "kg",
+    "ounce": "oz", "ounces": "oz", "pound": "lb", "pounds": "lb", "lbs": "lb",
+})
+UNIT_WORDS.update({unit: unit for unit in GRAMS_PER_UNIT})
+
+UNICODE_FRACTIONS = {"½": 0.5, "¼": 0.25, "¾": 0.75, "⅓": 1 / 3, "⅔": 2 / 3, "⅛": 0.125}
+
+QUANTITY = r"(?:\d+\s+\d+/\d+|\d+/\d+|\d+\s*[½¼¾⅓⅔⅛]|\d*\.\d+|\d+|[½¼¾⅓⅔⅛]|an?\b)"
+INGREDIENT_RE = re.compile(rf"^\s*(?P<quantity>{QUANTITY})?\s*(?P<rest>.*)$", re.IGNORECASE)
+
+# Lines like "salt, to taste" have no amount to add
+NO_AMOUNT_RE = re.compile(r",?\s*\(?\b(to taste|optional|as needed)\b\)?", re.IGNORECASE)
+
+# A comma only starts a new ingredient when a quantity follows it
+SPLIT_RE = re.compile(rf",\s*(?={QUANTITY}\s)", re.IGNORECASE)
+
+
+def parse_quantity(text: str) -> float:
+    text = text.strip().lower()
+    if text in ("a", "an"):
+        return 1.0
+    total = 0.0
+    for part in re.findall(r"\d+/\d+|\d*\.\d+|\d+|[½¼¾⅓⅔⅛]", text):
+        if part in UNICODE_FRACTIONS:
+            total += UNICODE_FRACTIONS[part]
+        elif "/" in part:
+            numerator, denominator = part.split("/")
+            # "1/0" is a typo, not an amount
+            if int(denominator):
+                total += int(numerator) / int(denominator)
+        else:
+            total += float(part)
+    return total
+
+
+def parse_ingredient(line: str) -> dict:
+    """Split "2 cups cooked rice" into quantity, unit and food text."""
+    match = INGREDIENT_RE.match(line)
+    quantity = parse_quantity(match["quantity"]) if match["quantity"] else 1.0
+    rest = match["rest"]
+    no_amount = bool(NO_AMOUNT_RE.search(rest))
+    rest = NO_AMOUNT_RE.sub("", rest)
+    # Package sizes and notes, e.g. "(15 oz)", only confuse the search
+    rest = re.sub(r"\s*\([^)]*\)", "", rest).strip()
+
+    unit = ""
+    words = rest.split()
+    # Two-word units first ("fl oz"), then single words ("cups", "g")
+    for size in (2, 1):
+        candidate = " ".join(words[:size]).lower().rstrip(".")
+        if len(words) > size and candidate in UNIT_WORDS:
+            unit = UNIT_WORDS[candidate]
+            rest = " ".join(words[size:])
+            break
+
+    food = re.sub(r"^of\s+", "", rest, flags=re.IGNORECASE).strip(" ,")
+    return {"line": line.strip(), "quantity": quantity, "unit": unit, "food": food, "no_amount": no_amount}
+
+
+def parse_recipe(text: str) -> list:
+    ingredients = []
+    for line in text.splitlines():
+        for part in SPLIT_RE.split(line):
+            if part.strip():
+                ingredients.append(parse_ingredient(part))
+    return [ingredient for ingredient in ingredients if ingredient["food"] and not ingredient["no_amount"]]
+
+
+def _portion_words(portion: dict) -> str:
+    return " ".join([
+        str(portion.get("modifier") or ""),
+        str((portion.get("measureUnit") or {}).get("name") or ""),
+        str(portion.get("portionDescription") or ""),
+    ]).lower()
+
+
+def _find_portion(portions: list, words: tuple):
+    """First portion mentioning any of `words`, trying the words in order."""
+    for word in words:
+        for portion in portions:
+            if re.search(rf"\b{re.escape(word)}\b", _portion_words(portion)):
+                return portion
+    return None
+
+
+def portion_grams(food_data: dict, quantity: float, unit: str) -> tuple:
+    """Convert a quantity to grams; returns the grams and whether they are estimated."""
+    if unit in GRAMS_PER_UNIT:
+        return quantity * GRAMS_PER_UNIT[unit], False
+
+    portions = [portion for portion in food_data.get("foodPortions", []) if portion.get("gramWeight")]
+    # No unit ("2 eggs") means a count of whole items, never a cup or spoon
+    portion = _find_portion(portions, HOUSEHOLD_UNIT_ALIASES.get(unit, ()) if unit else COUNT_PORTION_WORDS)
+    if portion is not None:
+        amount = portion.get("amount") or 1
+        return quantity * portion["gramWeight"] / amount, False
+
+    return quantity * FALLBACK_GRAMS_PER_UNIT.get(unit, 100), True
+
+
+def resolve_ingredient(ingredient: dict) -> dict:
+    """Find the best match for one parsed ingredient and build its meal item.
+
+    Runs off the script thread. Never raises; failures are reported in
+    the returned "error".
+    """
+    resolved = dict(ingredient, item=None, missing=[], estimated=False, error=None)
+    try:
+        matches = federated_search(ingredient["food"], limit=1)
+        if not matches:
+            resolved["error"] = "no matching food"
+            return resolved
+
+        food_data = get_usda_food_details(matches[0]["fdcId"])
+        if not food_data:
+            resolved["error"] = "could not fetch food details"
+            return resolved
+
+        grams, resolved["estimated"] = portion_grams(food_data, ingredient["quantity"], ingredient["unit"])
+        per_100g, missing = nutrients_per_100g(extract_nutrient_summary(food_data))
+        per_100g, resolved["missing"], filled = fill_missing_nutrients(matches[0]["fdcId"], per_100g, missing)
+        name = re.sub(r"\s*\(.*?\)", "", matches[0]["description"]).strip()
+        resolved["item"] = make_meal_item(
+            name, matches[0]["fdcId"], max(1, round(grams)), per_100g, estimated_nutrients(filled)
+        )
+    except Exception as e:
+        resolved["error"] = str(e)
+    return resolved
@@ -0,0 +1,174 @@
+import os
+import re
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+import streamlit as st
+
+from tool import load_food_data, search_usda_foods
+
+
+# --- Sources and their deadlines (seconds after the search starts) ---
+SOURCE_DEADLINES_S = {
+    "SR Legacy": 1.5,
+    "Foundation": 1.2,
+    "Survey (FNDDS)": 1.2,
+    "Branded": 1.0,
+}
+
+# Whatever has arrived by then is returned
+LATENCY_BUDGET_S = 1.5
+
+# Results fetched per FDC data type
+SOURCE_PAGE_SIZE = 50
+
+# Searches (across all sessions) whose fan-out can run without queueing
+CONCURRENT_SEARCHES = int(os.getenv("SEARCH_CONCURRENT_SEARCHES", "8"))
+
+# Branded items crowd out generic foods for most queries
+DATA_TYPE_PENALTY = {
+    "Local": 0,
+    "SR Legacy": 0,
+    "Foundation": 0,
+    "Survey (FNDDS)": 0.5,
+    "Branded": 1.5,
+}
+
+
+def normalize_description(description: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", " ", description.lower()).split())
+
+
+def match_score(description, query):
+    desc = description.lower()
+    query = query.lower()
+    query_words = query.split()
+
+    # Require all words in query to be present in description
+    if all(word in desc for word in query_words):
+        if desc == query:
+            return 0
+        if desc.startswith(query):
+            return 1
+        if query in desc:
+            return 2
+        return 3
+    return 99  # Penalize if any word is missing
+
+
+def boost_priority(description):
+    desc = description.lower()
+    penalty = 0
+    if "babyfood" in desc:
+        penalty += 2
+    if "dry mix" in desc:
+        penalty += 2
+    if "raw" in desc:
+        penalty -= 1
+    return penalty
+
+
+def score_result(item: dict, query: str) -> float:
+    """Single scorer shared by every source; lower is better."""
+    desc = item["description"]
+    return (
+        match_score(desc, query)
+        + boost_priority(desc)
+        + 0.05 * len(desc.split())
+        + DATA_TYPE_PENALTY.get(item.get("dataType"), 0)
+    )
+
+
+@st.cache_resource(show_spinner=False)
+def load_local_search_index() -> list:
+    """(fdc id, description, lowercased description) per local food, shared across sessions."""
+    food_df = load_food_data()
+    return [
+        (int(fdc_id), description, description.lower())
+        for fdc_id, description in food_df[["fdc_id", "description"]].itertuples(index=False)
+        if description
+    ]
+
+
+def search_local_foods(query: str, limit: int = SOURCE_PAGE_SIZE) -> list:
+    # Narrow the candidates one word at a time; each pass is a plain substring scan
+    candidates = load_local_search_index()
+    for word in query.lower().split():
+        candidates = [food for food in candidates if word in food[2]]
+
+    return [
+        {"fdcId": fdc_id, "description": description, "dataType": "Local"}
+        for fdc_id, description, _ in candidates[:limit]
+    ]
+
+
+@st.cache_resource
+def get_search_executor() -> ThreadPoolExecutor:
+    # One worker per source for each search that may be in flight at once
+    workers = len(SOURCE_DEADLINES_S) * CONCURRENT_SEARCHES
+    return ThreadPoolExecutor(max_workers=workers, thread_name_prefix="fdc-search")
+
+
+def _search_source(query: str, data_type: str) -> list:
+    results = search_usda_foods(query, data_type, SOURCE_PAGE_SIZE)
+    for item in results:
+        item.setdefault("dataType", data_type)
+    return results
+
+
+def federated_search(query: str, limit: int = 20, latency_budget_s: float = LATENCY_BUDGET_S) -> list:
+    """Search the local table and several FDC data types concurrently.
+
+    Each FDC data type is dropped once its own deadline (or the overall
+    latency budget) passes; late responses still land in the search cache
+    for the next keystroke. Results are deduplicated by fdcId and normalized
+    description and ranked with score_result.
+    """
+    start = time.monotonic()
+    executor = get_search_executor()
+    futures = {
+        executor.submit(_search_source, query, data_type): data_type
+        for data_type in SOURCE_DEADLINES_S
+    }
+
+    # The local table needs no I/O, so search it while requests are in flight
+    results = search_local_foods(query)
+
+    pending = set(futures)
+    while pending:
+        now = time.monotonic() - start
+        deadlines = {
+            future: min(SOURCE_DEADLINES_S[futures[future]], latency_budget_s)
+            for future in pending
+        }
+        expired = {future for future in pending if deadlines[future] <= now}
+        for future in expired:
+            # Requests still queued behind other searches are not worth sending
+            future.cancel()
+        pending -= expired
+        if not pending:
+            break
+
+        done, pending = wait(
+            pending,
+            timeout=min(deadlines[future] for future in pending) - now,
+            return_when=FIRST_COMPLETED,
+        )
+        for future in done:
+            try:
+                results.extend(future.result())
+            except Exception as e:
+                print(f"FDC search failed for {futures[future]}:", e)
+
+    merged = []
+    seen_ids, seen_descriptions = set(), set()
+    for item in sorted(results, key=lambda item: score_result(item, query)):
+        description = normalize_description(item["description"])
+        if item["fdcId"] in seen_ids or description in seen_descriptions:
+            continue
+        seen_ids.add(item["fdcId"])
+        seen_descriptions.add(description)
+        merged.append(item)
+        if len(merged) == limit:
+            break
+    return merged
@@ -0,0 +1,106 @@
+import base64
+
+from meal_log import recall_foods
+from tool import FOOD_TABLE_FIELDS, load_food_data, local_estimated_nutrients, make_meal_item
+
+
+# Bump when the layout changes so old links can still be read
+ENCODING_VERSION = 1
+
+# Limits for decoding untrusted links
+MAX_VARINT_SHIFT = 35
+MAX_FDC_ID = 99_999_999
+MAX_GRAMS = 100_000
+MAX_ITEMS = 50
+
+
+def _write_varint(value: int, out: bytearray):
+    while True:
+        byte = value & 0x7F
+        value >>= 7
+        if value:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return
+
+
+def _read_varint(data: bytes, pos: int) -> tuple:
+    value = shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("truncated meal code")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if not byte & 0x80:
+            return value, pos
+        shift += 7
+        if shift > MAX_VARINT_SHIFT:
+            raise ValueError("meal code number too long")
+
+
+def shareable_items(meal_items: list) -> list:
+    """The items a meal code holds: those with an fdc id, up to MAX_ITEMS."""
+    return [item for item in meal_items if item.get("fdc_id") is not None][:MAX_ITEMS]
+
+
+def encode_meal(meal_items: list) -> str:
+    """Pack (fdc_id, grams) pairs as varints in unpadded base64url."""
+    out = bytearray([ENCODING_VERSION])
+    for item in shareable_items(meal_items):
+        _write_varint(int(item["fdc_id"]), out)
+        _write_varint(min(MAX_GRAMS, max(1, round(item["grams"]))), out)
+    return base64.urlsafe_b64encode(bytes(out)).rstrip(b"=").decode()
+
+
+def decode_meal(code: str) -> list:
+    try:
+        data = base64.urlsafe_b64decode(code + "=" * (-len(code) % 4))
+    except ValueError:
+        raise ValueError("invalid meal code")
+    if not data or data[0] != ENCODING_VERSION:
+        raise ValueError("unsupported meal code")
+
+    pairs = []
+    pos = 1
+    while pos < len(data):
+        if len(pairs) == MAX_ITEMS:
+            raise ValueError("too many items in meal code")
+        fdc_id, pos = _read_varint(data, pos)
+        grams, pos = _read_varint(data, pos)
+        if not 0 < fdc_id <= MAX_FDC_ID or not 0 < grams <= MAX_GRAMS:
+            raise ValueError("meal code out of range")
+        pairs.append((fdc_id, grams))
+    return pairs
+
+
+def rehydrate_meal(pairs: list) -> tuple:
+    """Rebuild meal items from the local stores only, without FDC calls.
+
+    Foods previously added on this server come from the meal log's food
+    table, everything else from the local food table. Returns the items and
+    the fdc ids that neither store knows.
+    """
+    known = recall_foods([fdc_id for fdc_id, _ in pairs])
+
+    missing_ids = [fdc_id for fdc_id, _ in pairs if fdc_id not in known]
+    if missing_ids:
+        food_df = load_food_data()
+        rows = food_df[food_df["fdc_id"].isin(missing_ids)]
+        for row in rows.itertuples(index=False):
+            known[int(row.fdc_id)] = {
+                "name": row.description,
+                "per_100g": {field: float(getattr(row, column)) for field, column in FOOD_TABLE_FIELDS.items()},
+            }
+
+    items = []
+    unknown = []
+    for fdc_id, grams in pairs:
+        food = known.get(fdc_id)
+        if food is None:
+            unknown.append(fdc_id)
+            continue
+        estimated = local_estimated_nutrients(fdc_id, food["per_100g"])
+        items.append(make_meal_item(food["name"], fdc_id, grams, food["per_100g"], estimated))
+    return items, unknown
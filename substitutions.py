@@ -0,0 +1,135 @@
+import re
+import zlib
+
+import numpy as np
+import pandas as pd
+import streamlit as st
+from scipy.spatial import cKDTree
+
+from search import normalize_description
+from tool import FOOD_NUTRIENT_COLUMNS, load_food_data
+
+
+# Number of hashed buckets used for the description token features
+TOKEN_DIMS = 16
+
+# How strongly the description features pull neighbours together
+# compared to the nutrient features
+TOKEN_WEIGHT = 1.5
+
+
+def description_tokens(description: str) -> set:
+    return set(re.findall(r"[a-z]+", description.lower()))
+
+
+def _head_bucket(description: str) -> int:
+    # SR Legacy names lead with the food ("Beef, ...", "Cheese, ...")
+    head = description.split(",")[0].strip().lower()
+    return zlib.crc32(head.encode()) % TOKEN_DIMS
+
+
+class SubstitutionIndex:
+    """KD-tree over normalized per-100g nutrients plus description features.
+
+    Built once per process; each query is a single tree lookup followed by a
+    small filter over the returned neighbours.
+    """
+
+    def __init__(self, food_df: pd.DataFrame):
+        self.foods = food_df.reset_index(drop=True)
+        self.values = self.foods[FOOD_NUTRIENT_COLUMNS].to_numpy(dtype=float)
+
+        # log1p tames the long tail (oils, sugars) before standardizing
+        logged = np.log1p(np.clip(self.values, 0, None))
+        scale = logged.std(axis=0)
+        scale[scale == 0] = 1
+        nutrient_features = (logged - logged.mean(axis=0)) / scale
+
+        token_features = np.zeros((len(self.foods), TOKEN_DIMS))
+        buckets = [_head_bucket(d) for d in self.foods["description"]]
+        token_features[np.arange(len(self.foods)), buckets] = TOKEN_WEIGHT
+
+        self.features = np.hstack([nutrient_features, token_features])
+        self.tree = cKDTree(self.features)
+        self.tokens = [description_tokens(d) for d in self.foods["description"]]
+        self.fdc_ids = self.foods["fdc_id"].to_numpy()
+        self.descriptions = self.foods["description"].tolist()
+        # The table repeats some foods under several fdc ids
+        self.description_keys = [normalize_description(d) for d in self.descriptions]
+
+        # Imputed values (enrichment.py provenance) cannot show a food is lower
+        self.reported = np.column_stack([
+            self.foods[f"{column}_source"].eq("reported").to_numpy()
+            if f"{column}_source" in self.foods else np.ones(len(self.foods), dtype=bool)
+            for column in FOOD_NUTRIENT_COLUMNS
+        ])
+        self.row_by_fdc_id = {int(fdc_id): i for i, fdc_id in enumerate(self.fdc_ids)}
+
+    def healthier_alternatives(
+        self,
+        fdc_id: int,
+        less: tuple = ("Sugars", "Fats"),
+        limit: int = 5,
+        min_reduction: float = 0.1,
+        neighbours: int = 40,
+    ) -> list:
+        """Foods similar to `fdc_id` that are lower in the `less` nutrients.
+
+        A candidate must not be higher in any of the `less` nutrients and must
+        cut their combined amount by at least `min_reduction`, with those
+        nutrients reported rather than imputed. Copies of the food itself
+        and repeated descriptions are skipped.
+        """
+        row = self.row_by_fdc_id.get(int(fdc_id))
+        if row is None:
+            return []
+
+        columns = [FOOD_NUTRIENT_COLUMNS.index(name) for name in less]
+        source = self.values[row, columns]
+        source_total = source.sum()
+        if source_total <= 0:
+            return []
+
+        k = min(neighbours + 1, len(self.foods))
+        distances, rows = self.tree.query(self.features[row], k=k)
+        distances, rows = np.atleast_1d(distances), np.atleast_1d(rows)
+
+        amounts = self.values[rows][:, columns]
+        keep = (
+            (rows != row)
+            & self.reported[rows][:, columns].all(axis=1)
+            & (amounts <= source).all(axis=1)
+            & (amounts.sum(axis=1) <= source_total * (1 - min_reduction))
+        )
+
+        candidates = []
+        for distance, other in zip(distances[keep], rows[keep]):
+            overlap = self.tokens[row] & self.tokens[other]
+            union = self.tokens[row] | self.tokens[other]
+            similarity = len(overlap) / len(union) if union else 0
+            candidates.append((distance - similarity, other))
+
+        candidates.sort()
+        results = []
+        seen = {self.description_keys[row]}
+        for _, other in candidates:
+            if self.description_keys[other] in seen:
+                continue
+            seen.add(self.description_keys[other])
+            results.append(self._record(other))
+            if len(results) == limit:
+                break
+        return results
+
+    def _record(self, row: int) -> dict:
+        record = {
+            "fdc_id": int(self.fdc_ids[row]),
+            "description": self.descriptions[row],
+        }
+        record.update(zip(FOOD_NUTRIENT_COLUMNS, self.values[row].tolist()))
+        return record
+
+
+@st.cache_resource(show_spinner="🧭 Indexing foods...")
+def load_substitution_index() -> SubstitutionIndex:
+    return SubstitutionIndex(load_food_data())
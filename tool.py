@@ -1,15 +1,111 @@
 import requests
 import os
+import re
 from dotenv import load_dotenv
 import json
+import threading
+import time
+from collections import OrderedDict
+import pandas as pd
 import streamlit as st
+from popularity import normalize_query, query_log
 
 
 load_dotenv()
 API_KEY = os.getenv("USDA_API_KEY")
 
-@st.cache_data(show_spinner="🔍 Searching USDA...")
+# Upper bound for any single FDC request
+USDA_REQUEST_TIMEOUT_S = float(os.getenv("USDA_REQUEST_TIMEOUT_S", "10"))
+
+# --- Cache warming budget ---
+CACHE_WARM_TOP_QUERIES = int(os.getenv("CACHE_WARM_TOP_QUERIES", "50"))
+CACHE_WARM_TOP_FOODS = int(os.getenv("CACHE_WARM_TOP_FOODS", "50"))
+CACHE_WARM_TIME_BUDGET_S = float(os.getenv("CACHE_WARM_TIME_BUDGET_S", "20"))
+CACHE_WARM_MEMORY_BUDGET_MB = float(os.getenv("CACHE_WARM_MEMORY_BUDGET_MB", "20"))
+
+# Bounds for the cached FDC search responses (one entry per query and data type)
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "500"))
+SEARCH_CACHE_TTL_S = float(os.getenv("SEARCH_CACHE_TTL_S", "86400"))
+
+# Upper bound for the projected food details kept in memory
+FOOD_DETAILS_CACHE_MB = float(os.getenv("FOOD_DETAILS_CACHE_MB", "16"))
+
+# FDC nutrient names used by extract_nutrient_summary. Foundation foods
+# name energy, carbs and sugars differently from SR Legacy.
+DESIRED_NUTRIENTS = {
+    "Energy": "Calories",
+    "Energy (Atwater General Factors)": "Calories",
+    "Energy (Atwater Specific Factors)": "Calories",
+    "Protein": "Protein",
+    "Total lipid (fat)": "Fat",
+    "Carbohydrate, by difference": "Carbs",
+    "Carbohydrate, by summation": "Carbs",
+    "Total Sugars": "Sugar",
+    "Sugars, Total": "Sugar",
+    "Sugars, total including NLEA": "Sugar",
+}
+
+class ByteLRUCache:
+    """Thread-safe LRU cache bounded by the serialized size of its values."""
+
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key, value):
+        size = len(json.dumps(value))
+        if size > self.max_bytes:
+            return
+        with self.lock:
+            if key in self.entries:
+                self.bytes -= self.entries.pop(key)[1]
+            self.entries[key] = (value, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                _, (_, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+                self.evictions += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+            }
+
+food_details_cache = ByteLRUCache(int(FOOD_DETAILS_CACHE_MB * 1024 * 1024))
+
 def search_usda_foods(query, data_type="SR Legacy", page_size=10):
+    # Cache on the same normalized text the warmer replays from the query log
+    query = normalize_query(query)
+    query_log.record_query(query, data_type, page_size)
+    return _search_usda_foods(query, data_type, page_size)
+
+def get_usda_food_details(fdc_id):
+    query_log.record_food(fdc_id)
+    return _get_usda_food_details(fdc_id)
+
+@st.cache_data(show_spinner="🔍 Searching USDA...", max_entries=SEARCH_CACHE_MAX_ENTRIES, ttl=SEARCH_CACHE_TTL_S)
+def _search_usda_foods(query, data_type="SR Legacy", page_size=10):
     url = "https://api.nal.usda.gov/fdc/v1/foods/search"
     params = {
         "query": query,
@@ -17,37 +113,118 @@ def search_usda_foods(query, data_type="SR Legacy", page_size=10):
         "dataType": [data_type],
         "pageSize": page_size
     }
-    response = requests.get(url, params=params)
-    if response.status_code == 200:
-        return response.json().get("foods", [])
-    else:
-        return []
+    response = requests.get(url, params=params, timeout=USDA_REQUEST_TIMEOUT_S)
+    # Raising keeps failures such as rate limits out of the cache
+    response.raise_for_status()
+    return response.json().get("foods", [])
+
+def project_food_details(food_data: dict) -> dict:
+    """Keep only the fields the app reads: the summary nutrients and portions."""
+    nutrients = []
+    for item in food_data.get("foodNutrients", []):
+        nutrient = item.get("nutrient", {})
+        if nutrient.get("name") in DESIRED_NUTRIENTS and item.get("amount") is not None:
+            nutrients.append({
+                "nutrient": {"name": nutrient["name"], "unitName": nutrient.get("unitName")},
+                "amount": item["amount"],
+            })
+
+    portions = []
+    for portion in food_data.get("foodPortions", []):
+        if not portion.get("gramWeight"):
+            continue
+        portions.append({
+            "amount": portion.get("amount"),
+            "gramWeight": portion["gramWeight"],
+            "modifier": portion.get("modifier"),
+            "measureUnit": {"name": (portion.get("measureUnit") or {}).get("name")},
+            "portionDescription": portion.get("portionDescription"),
+        })
+
+    return {
+        "fdcId": food_data.get("fdcId"),
+        "description": food_data.get("description"),
+        "dataType": food_data.get("dataType"),
+        "foodNutrients": nutrients,
+        "foodPortions": portions,
+    }
+
+def _get_usda_food_details(fdc_id):
+    """Projected food details, cached in food_details_cache.
+
+    The returned record is shared between sessions; do not modify it.
+    """
+    cached = food_details_cache.get(int(fdc_id))
+    if cached is not None:
+        return cached
 
-@st.cache_data(show_spinner="📦 Getting food details...")
-def get_usda_food_details(fdc_id):
     url = f"https://api.nal.usda.gov/fdc/v1/food/{fdc_id}"
     params = {"api_key": API_KEY}
-    response = requests.get(url, params=params)
+    response = requests.get(url, params=params, timeout=USDA_REQUEST_TIMEOUT_S)
     
     if response.status_code == 200:
-        food_data = response.json()
-        #print(json.dumps(food_data["foodNutrients"], indent=2))  # ✅ This is the correct variable
+        food_data = project_food_details(response.json())
+        food_details_cache.put(int(fdc_id), food_data)
         return food_data
     else:
         print("Failed to fetch food details:", response.text)
         return None
 
+def warm_caches(
+    top_queries: int = CACHE_WARM_TOP_QUERIES,
+    top_foods: int = CACHE_WARM_TOP_FOODS,
+    time_budget_s: float = CACHE_WARM_TIME_BUDGET_S,
+    memory_budget_mb: float = CACHE_WARM_MEMORY_BUDGET_MB,
+) -> dict:
+    """Preload the most popular searches and foods into the caches.
+
+    Stops as soon as either the time or the memory budget (measured as the
+    JSON size of the cached payloads) is used up.
+    """
+    deadline = time.monotonic() + time_budget_s
+    memory_budget = memory_budget_mb * 1024 * 1024
+    stats = {"queries": 0, "foods": 0, "bytes": 0}
+
+    def within_budget():
+        return time.monotonic() < deadline and stats["bytes"] < memory_budget
+
+    # Calls go to the cached functions directly so warming is not counted
+    for query, data_type, page_size in query_log.top_queries(top_queries):
+        if not within_budget():
+            return stats
+        try:
+            results = _search_usda_foods(query, data_type, page_size)
+        except requests.RequestException as e:
+            print("Cache warming skipped a query:", e)
+            continue
+        stats["queries"] += 1
+        stats["bytes"] += len(json.dumps(results))
+
+    for fdc_id in query_log.top_foods(top_foods):
+        if not within_budget():
+            return stats
+        food_data = _get_usda_food_details(fdc_id)
+        stats["foods"] += 1
+        stats["bytes"] += len(json.dumps(food_data))
+
+    return stats
+
+@st.cache_resource(show_spinner=False)
+def start_cache_warmer() -> threading.Thread:
+    """Warm the caches once per process in a background thread."""
+    def run():
+        try:
+            print("Cache warming finished:", warm_caches(), food_details_cache.stats())
+        except Exception as e:
+            print("Cache warming failed:", e)
+
+    thread = threading.Thread(target=run, name="cache-warmer", daemon=True)
+    thread.start()
+    return thread
+
 def extract_nutrient_summary(food_data: dict) -> dict:
     nutrient_list = food_data.get("foodNutrients", [])
 
-    desired_nutrients = {
-        "Energy": "Calories",
-        "Protein": "Protein",
-        "Total lipid (fat)": "Fat",
-        "Carbohydrate, by difference": "Carbs",
-        "Total Sugars": "Sugar"
-    }
-
     summary = {}
 
     for item in nutrient_list:
@@ -58,9 +235,206 @@ def extract_nutrient_summary(food_data: dict) -> dict:
         if not name or amount is None:
             continue
 
-        if name in desired_nutrients:
-            label = desired_nutrients[name]
-            summary[label] = f"{amount} {unit}"
+        if name in DESIRED_NUTRIENTS:
+            label = DESIRED_NUTRIENTS[name]
+            # A food may report several variants; the first one wins
+            summary.setdefault(label, f"{amount} {unit}")
 
     return summary
 
+
+
+# Per-100g nutrient columns of the local food table
+FOOD_NUTRIENT_COLUMNS = ["Calories", "Carbohydrate", "Protein", "Fats", "Sugars"]
+
+# Local food table column for each meal item field
+FOOD_TABLE_FIELDS = {
+    "calories": "Calories",
+    "protein": "Protein",
+    "carbs": "Carbohydrate",
+    "fat": "Fats",
+    "sugar": "Sugars",
+}
+
+RAW_FOOD_PATH = "cleaned_food_sample.csv"
+
+# Written by enrichment.py; preferred when present
+ENRICHED_FOOD_PATH = "enriched_food_sample.csv"
+
+def normalize_food_table(food_df: pd.DataFrame) -> pd.DataFrame:
+    """Deduplicate the food table and convert energy to kcal per 100 g."""
+    food_df = food_df.dropna(subset=["fdc_id", "description"]).drop_duplicates("fdc_id").copy()
+    food_df["fdc_id"] = food_df["fdc_id"].astype(int)
+    convert_kj_rows(food_df)
+    return food_df.reset_index(drop=True)
+
+def non_atwater_energy_bound(description: str) -> float:
+    """Most kcal per 100 g a food can get from ethanol (7 kcal/g) or acetic acid (3.6 kcal/g)."""
+    desc = description.lower()
+    if desc.startswith("vinegar"):
+        return 6 * 3.6
+    if not desc.startswith("alcoholic beverage"):
+        return 0
+    proof = re.search(r"(\d+) proof", desc)
+    if proof:
+        # Half the proof is % alcohol by volume; ~0.83 g ethanol per 100 g for each %
+        ethanol_g = int(proof[1]) / 2 * 0.83
+    elif "beer" in desc:
+        ethanol_g = 10
+    else:
+        ethanol_g = 20
+    return 7 * ethanol_g * 1.1
+
+def convert_kj_rows(food_df: pd.DataFrame, rows: pd.Series = None):
+    """Convert, in place, the Calories values that are really kJ to kcal.
+
+    Not idempotent: each row must go through it once, so later passes
+    restrict it to the `rows` that were not checked before.
+    """
+    # The Calories column mixes kJ and kcal rows. A value well above the
+    # Atwater estimate (4/4/9 kcal per g of carbs/protein/fat) is kJ.
+    atwater = 4 * (food_df["Carbohydrate"] + food_df["Protein"]) + 9 * food_df["Fats"]
+    is_kj = (atwater > 0) & (food_df["Calories"] > 2.5 * atwater)
+
+    # Alcohol and vinegar get energy Atwater leaves out; there it is kJ
+    # only when it exceeds anything their ethanol or acid could supply
+    extra = food_df["description"].map(non_atwater_energy_bound)
+    is_kj = is_kj.where(extra == 0, food_df["Calories"] > atwater + extra)
+
+    if rows is not None:
+        is_kj &= rows
+    food_df.loc[is_kj, "Calories"] = (food_df.loc[is_kj, "Calories"] / 4.184).round(1)
+
+@st.cache_data(show_spinner="🥗 Loading food table...")
+def load_food_data(path: str = None) -> pd.DataFrame:
+    """Load the local food table, enriched when available, in kcal per 100 g."""
+    if path is None:
+        path = ENRICHED_FOOD_PATH if os.path.exists(ENRICHED_FOOD_PATH) else RAW_FOOD_PATH
+    food_df = pd.read_csv(path)
+    # enrichment.py already normalized its output; converting again would
+    # divide some energies by 4.184 a second time
+    if "Calories_source" in food_df:
+        return food_df
+    return normalize_food_table(food_df)
+
+@st.cache_resource(show_spinner=False)
+def load_local_nutrients() -> dict:
+    """Per-100g values and their provenance from the local food table, by fdc id."""
+    food_df = load_food_data()
+    lookup = {}
+    for row in food_df.to_dict("records"):
+        per_100g = {field: row[column] for field, column in FOOD_TABLE_FIELDS.items()}
+        sources = {
+            field: row.get(f"{column}_source", "reported")
+            for field, column in FOOD_TABLE_FIELDS.items()
+        }
+        lookup[int(row["fdc_id"])] = (per_100g, sources)
+    return lookup
+
+def fill_missing_nutrients(fdc_id, per_100g: dict, missing_fields: list) -> tuple:
+    """Fill nutrients the FDC record lacks with the local table's finished values.
+
+    Returns the updated values, the labels still missing and, for each
+    label that was filled, the local value's provenance ("reported" or how
+    enrichment.py estimated it).
+    """
+    local = load_local_nutrients().get(int(fdc_id)) if missing_fields else None
+    if local is None:
+        return per_100g, missing_fields, {}
+
+    local_values, local_sources = local
+    per_100g = dict(per_100g)
+    still_missing, filled = [], {}
+    for label in missing_fields:
+        field = MEAL_NUTRIENT_FIELDS[label]
+        value = local_values.get(field)
+        if value is None or pd.isna(value):
+            still_missing.append(label)
+        else:
+            per_100g[field] = float(value)
+            filled[label] = local_sources[field]
+    return per_100g, still_missing, filled
+
+def estimated_nutrients(filled: dict) -> list:
+    """Labels from fill_missing_nutrients whose values were estimated, not reported."""
+    return [label for label, source in filled.items() if source != "reported"]
+
+def local_estimated_nutrients(fdc_id, per_100g: dict = None) -> list:
+    """Labels whose local-table value for `fdc_id` was estimated by enrichment.py.
+
+    With `per_100g`, only labels whose value matches the local one count,
+    i.e. those that were filled from the local table.
+    """
+    local = load_local_nutrients().get(int(fdc_id))
+    if local is None:
+        return []
+    local_values, local_sources = local
+    return estimated_nutrients({
+        label: local_sources[field]
+        for label, field in MEAL_NUTRIENT_FIELDS.items()
+        if per_100g is None or per_100g.get(field) == local_values[field]
+    })
+
+# Maps the labels of extract_nutrient_summary to meal item fields
+MEAL_NUTRIENT_FIELDS = {
+    "Calories": "calories",
+    "Protein": "protein",
+    "Carbs": "carbs",
+    "Fat": "fat",
+    "Sugar": "sugar",
+}
+
+def nutrients_per_100g(summary: dict) -> tuple:
+    """Parse a nutrient summary into kcal/grams per 100 g.
+
+    Returns the values keyed by meal item field and the labels that were missing.
+    """
+    values = {}
+    missing = []
+    for label, field in MEAL_NUTRIENT_FIELDS.items():
+        try:
+            raw = summary[label]  # e.g., "371 KJ" or "89 KCAL"
+            val, unit = raw.split()
+            val = float(val)
+
+            if label == "Calories":
+                if unit.upper() == "KJ":
+                    val = val / 4.184
+                elif unit.upper() != "KCAL":
+                    print("Unexpected energy unit:", unit)
+
+            values[field] = val
+        except (KeyError, ValueError):
+            missing.append(label)
+            values[field] = 0
+    return values, missing
+
+def make_meal_item(name: str, fdc_id, grams: float, per_100g: dict, estimated: list = None) -> dict:
+    item = {"name": name, "fdc_id": fdc_id, "grams": grams, "per_100g": per_100g}
+    if estimated:
+        item["estimated_nutrients"] = estimated
+    item.update(scale_nutrients(per_100g, grams))
+    return item
+
+def scale_nutrients(per_100g: dict, grams: float) -> dict:
+    multiplier = grams / 100
+    return {field: round(per_100g.get(field, 0) * multiplier, 1) for field in MEAL_NUTRIENT_FIELDS.values()}
+
+def fetch_meal_item(fdc_id, food_name: str, grams: float) -> tuple:
+    """Fetch a food and build its meal item; safe to run off the script thread.
+
+    Returns the item (None if the details could not be fetched), the
+    nutrient labels nobody reported and the provenance of those filled
+    from the local table.
+    """
+    food_data = get_usda_food_details(fdc_id)
+    if not food_data:
+        return None, [], {}
+    per_100g, missing_fields = nutrients_per_100g(extract_nutrient_summary(food_data))
+    per_100g, missing_fields, filled_fields = fill_missing_nutrients(fdc_id, per_100g, missing_fields)
+    item = make_meal_item(food_name, fdc_id, grams, per_100g, estimated_nutrients(filled_fields))
+    return item, missing_fields, filled_fields
+
+def meal_signature(meal_items: list) -> str:
+    """Identifies the meal's contents; changes whenever an item or amount does."""
+    return json.dumps([[item.get("fdc_id"), item["name"], item["grams"]] for item in meal_items])